@@ -7,6 +7,8 @@ import re
 import json
 import logging
 import shutil
+import stat
+import tempfile
 import time
 import hashlib
 import threading
@@ -32,8 +34,8 @@ from utils.cleanup import cleanup_aged_files, init_cleanup_cli
 from utils.file_naming_utils import rename_processed_files
 
 # Import session-based file management
-from utils.file_manager import ensure_session_id, get_session_folder
-from utils.cleanup import manual_clear_session_folders, schedule_session_cleanup
+from utils.file_manager import ensure_session_id, get_session_folder, scan_session_folder
+from utils.cleanup import manual_clear_session_folders, register_session_sweep
 from utils.file_utils import save_uploaded_file as session_save_uploaded_file
 
 # Import APScheduler
@@ -51,6 +53,8 @@ CACHE_EXPIRY_MINUTES = 30
 MAX_FILE_SIZE_MB = 10
 MAX_FILES = 5
 MERGE_MIN_FILES = 2
+ZIP_WRITE_BUFFER_SIZE = 1 << 20  # 1 MB
+ZIP_SPOOL_MAX_SIZE = 8 * 1024 * 1024  # 8 MB kept in memory before spilling to disk
 
 # ----------------- Initialize Flask -----------------
 app = Flask(__name__)
@@ -74,9 +78,14 @@ app.logger.info('PDFMaster Pro startup')
 logger = logging.getLogger(__name__)
 
 # ----------------- Initialize APScheduler -----------------
+# Worker-pool processes (forkserver/spawn) re-import this script as __mp_main__ when the
+# app is started with `python app.py`; they must never run a scheduler of their own
+IS_POOL_WORKER = __name__ == '__mp_main__'
+
 scheduler = BackgroundScheduler(daemon=True)
-scheduler.start()
-logger.info("APScheduler initialized")
+if not IS_POOL_WORKER:
+    scheduler.start()
+    logger.info("APScheduler initialized")
 
 # ----------------- Initialize App -----------------
 Config.init_app(app)
@@ -107,17 +116,20 @@ def get_session_context() -> str:
     session_id = session.get('session_id', 'no-session')
     return f"[SESSION:{session_id[:8]}]"
 
+def format_size_bytes(size_bytes: int) -> str:
+    """Format an already-known byte count in human-readable format"""
+    if size_bytes < 1024 * 1024:
+        return f"{size_bytes / 1024:.2f} KB"
+    else:
+        return f"{size_bytes / (1024*1024):.2f} MB"
+
 def format_file_size(file_path: str) -> str:
     """Format file size in human-readable format"""
     try:
         if not os.path.exists(file_path):
             return "File not found"
             
-        size_bytes = os.path.getsize(file_path)
-        if size_bytes < 1024 * 1024:
-            return f"{size_bytes / 1024:.2f} KB"
-        else:
-            return f"{size_bytes / (1024*1024):.2f} MB"
+        return format_size_bytes(os.path.getsize(file_path))
     except Exception as e:
         logger.error(f"{get_session_context()} Error getting file size for {file_path}: {e}")
         return "Unknown size"
@@ -240,8 +252,7 @@ class SessionData:
     """Centralized session data management"""
     
     def __init__(self):
-        self.processed_files: List[str] = [] # List of stored filenames
-        self.processed_files_details: List[Dict[str, str]] = [] # List of dicts: {'stored_name': '...', 'display_name': '...'}
+        self.processed_files_details: Dict[str, Dict[str, str]] = {} # stored_name -> {'stored_name': '...', 'display_name': '...'}
         self.file_times: Dict[str, float] = {}
         self.countdown: Dict[str, Any] = {
             'start_time': time.time(),
@@ -261,10 +272,43 @@ class SessionData:
     
     def clear_processed_files(self) -> None:
         """Clear processed files list"""
-        self.processed_files = []
-        self.processed_files_details = []
+        self.processed_files_details = {}
         self.file_times = {}
 
+def empty_session_data() -> Dict[str, Any]:
+    """
+    Build a fresh session_data dict equivalent to SessionData().__dict__
+    without instantiating the class. Containers are created per call so
+    sessions never share (and mutate) the same countdown or file dicts.
+    """
+    now = time.time()
+    return {
+        'processed_files_details': {},
+        'file_times': {},
+        'countdown': {
+            'start_time': now,
+            'end_time': now + SESSION_TIMEOUT_SECONDS,
+            'active': True
+        },
+        'preview_data': {},
+        'session_id': ensure_session_id()
+    }
+
+def get_processed_files_details(session_data: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+    """
+    Return the processed file details of session_data keyed by stored_name.
+    Sessions created before the dict format stored a list of details plus a
+    parallel processed_files list; those are upgraded in place.
+    """
+    details = session_data.get('processed_files_details')
+    if isinstance(details, list):
+        details = {d['stored_name']: d for d in details if d.get('stored_name')}
+    elif not isinstance(details, dict):
+        details = {}
+    session_data['processed_files_details'] = details
+    session_data.pop('processed_files', None)
+    return details
+
 # ----------------- Session Initialization -----------------
 @app.before_request
 def initialize_session():
@@ -278,11 +322,11 @@ def initialize_session():
             # Migrate old session format to new if 'countdown' is missing
             session_data = SessionData()
             # Attempt to preserve existing processed files if they were in old format
-            session_data.processed_files = session.get('processed_files', [])
+            legacy_processed_files = session.get('processed_files', [])
             session_data.file_times = session.get('file_times', {})
             # If processed_files_details was not present, initialize it
             if 'processed_files_details' not in session.get('session_data', {}):
-                session_data.processed_files_details = [{'stored_name': f, 'display_name': f} for f in session_data.processed_files]
+                session_data.processed_files_details = {f: {'stored_name': f, 'display_name': f} for f in legacy_processed_files}
             
             session['session_data'] = session_data.__dict__
             logger.info(f"{get_session_context()} Migrated old session format")
@@ -459,6 +503,13 @@ def generic_process(tool_id: str, uploaded_files: Optional[List[str]] = None,
 # ----------------- Initialize Cleanup System -----------------
 init_cleanup_cli(app)
 
+# One periodic sweep removes expired session folders for every session
+if not IS_POOL_WORKER:
+    try:
+        register_session_sweep(scheduler, app)
+    except Exception as e:
+        logger.error(f"Failed to schedule session sweep: {e}")
+
 # Global flag for scheduler
 cleanup_scheduler_started = False
 
@@ -840,9 +891,7 @@ def process_tool(tool_id):
         # Get list of existing files before processing
         processed_folder = app.config.get('PROCESSED_FOLDER', DEFAULT_CONFIG['PROCESSED_FOLDER'])
         session_folder = get_session_folder(processed_folder)
-        existing_files = set()
-        if os.path.exists(session_folder):
-            existing_files = set(os.listdir(session_folder))
+        existing_files = {name for name, _, _ in scan_session_folder(session_folder)}
         
         tool_options = {}
         for key in request.form:
@@ -866,14 +915,12 @@ def process_tool(tool_id):
         if status_code == 200:
             # Scan for new files created during processing
             if os.path.exists(session_folder):
-                current_files = set(os.listdir(session_folder))
-                new_files = current_files - existing_files
+                # One scandir pass yields names and mtimes for the tracking below
+                file_mtimes = {name: mtime for name, _, mtime in scan_session_folder(session_folder)}
+                new_files = set(file_mtimes) - existing_files
                 
                 session_data = session.get('session_data', {})
-                if 'processed_files' not in session_data:
-                    session_data['processed_files'] = []
-                if 'processed_files_details' not in session_data:
-                    session_data['processed_files_details'] = []
+                processed_details = get_processed_files_details(session_data)
                 
                 # Determine which files to add to session tracking
                 files_to_track = []
@@ -903,8 +950,7 @@ def process_tool(tool_id):
 
                 # Add selected new files to session tracking
                 for filename in files_to_track:
-                    if filename not in session_data['processed_files']:
-                        session_data['processed_files'].append(filename)
+                    if filename not in processed_details:
                         
                         # Determine display name for the file
                         display_name = filename
@@ -942,17 +988,16 @@ def process_tool(tool_id):
                                 elif tool_id == 'pdf-to-text':
                                     display_name += '.txt'
 
-                        session_data['processed_files_details'].append({
+                        processed_details[filename] = {
                             'stored_name': filename,
                             'display_name': display_name
-                        })
+                        }
                         
                     # Store file creation time
-                    file_path = os.path.join(session_folder, filename)
-                    if os.path.exists(file_path):
+                    if filename in file_mtimes:
                         if 'file_times' not in session_data:
                             session_data['file_times'] = {}
-                        session_data['file_times'][filename] = os.path.getmtime(file_path)
+                        session_data['file_times'][filename] = file_mtimes[filename]
                 
                 session['session_data'] = session_data
                 logger.info(f"{get_session_context()} Added {len(files_to_track)} new files to session tracking: {files_to_track}")
@@ -997,12 +1042,9 @@ def download_processed_file(filename):
         file_path = os.path.join(session_folder, filename)
         
         if os.path.exists(file_path):
-            display_name = filename # Default to filename
             session_data = session.get('session_data', {})
-            for f_info in session_data.get('processed_files_details', []):
-                if f_info.get('stored_name') == filename:
-                    display_name = f_info.get('display_name', filename)
-                    break
+            f_info = get_processed_files_details(session_data).get(filename)
+            display_name = f_info.get('display_name', filename) if f_info else filename
             
             # Ensure display_name has an extension, if not, add based on filename
             if not os.path.splitext(display_name)[1]:
@@ -1033,24 +1075,27 @@ def download_page(tool_id):
         session_data = session.get('session_data', {})
         
         # Ensure processed_files_details exists and is up-to-date with actual files
-        if 'processed_files_details' not in session_data:
-            session_data['processed_files_details'] = []
+        processed_details = get_processed_files_details(session_data)
         
         processed_folder = app.config.get('PROCESSED_FOLDER', DEFAULT_CONFIG['PROCESSED_FOLDER'])
         session_folder = get_session_folder(processed_folder)
         
         # Re-validate processed_files_details against actual files on disk
-        valid_processed_files_details = []
-        for f_detail in session_data.get('processed_files_details', []):
-            stored_name = f_detail.get('stored_name')
+        valid_processed_files_details = {}
+        for stored_name, f_detail in processed_details.items():
             if stored_name:
                 file_path = os.path.join(session_folder, stored_name)
-                if os.path.isfile(file_path):
+                # One stat per file covers the existence check, mtime and size
+                try:
+                    file_stat = os.stat(file_path)
+                except OSError:
+                    file_stat = None
+                if file_stat is not None and stat.S_ISREG(file_stat.st_mode):
                     # Update file_times if necessary
                     if stored_name not in session_data.get('file_times', {}):
                         if 'file_times' not in session_data:
                             session_data['file_times'] = {}
-                        session_data['file_times'][stored_name] = os.path.getmtime(file_path)
+                        session_data['file_times'][stored_name] = file_stat.st_mtime
                     
                     file_mtime = session_data['file_times'][stored_name]
                     
@@ -1060,19 +1105,18 @@ def download_page(tool_id):
                     processed_files.append({
                         'name': stored_name,
                         'display_name': display_name,
-                        'size': format_file_size(file_path),
+                        'size': format_size_bytes(file_stat.st_size),
                         'upload_time': datetime.fromtimestamp(file_mtime).strftime('%Y-%m-%d %H:%M:%S'),
                         'download_url': url_for('download_processed_file', filename=stored_name),
                         'tool_used': tool['name'],
                         'processed_time': datetime.fromtimestamp(file_mtime).strftime('%Y-%m-%d %H:%M:%S')
                     })
-                    valid_processed_files_details.append(f_detail)
+                    valid_processed_files_details[stored_name] = f_detail
                 else:
                     logger.warning(f"{get_session_context()} Processed file {stored_name} not found on disk, removing from session tracking.")
             
         # Update session with validated details
-        session_data['processed_files'] = [f['stored_name'] for f in valid_processed_files_details] # Keep list of just names
-        session_data['processed_files_details'] = valid_processed_files_details # Store richer details
+        session_data['processed_files_details'] = valid_processed_files_details
         session['session_data'] = session_data
         
         # Check countdown status
@@ -1102,27 +1146,35 @@ def download_zip():
     try:
         processed_folder = app.config.get('PROCESSED_FOLDER', DEFAULT_CONFIG['PROCESSED_FOLDER'])
         session_folder = get_session_folder(processed_folder)
-        files_in_folder = os.listdir(session_folder) if os.path.exists(session_folder) else []
+        files_in_folder = []
+        if os.path.exists(session_folder):
+            with os.scandir(session_folder) as entries:
+                files_in_folder = [entry.name for entry in entries if entry.is_file()]
         
         if not files_in_folder:
             return jsonify({"status": "error", "message": "No files available for ZIP download."}), 404
         
-        memory_file = io.BytesIO()
-        with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zf:
+        # A single processed file needs no archive: serve it as-is
+        if len(files_in_folder) == 1:
+            return download_processed_file(files_in_folder[0])
+        
+        # Small archives stay in RAM; large ones spill to a temp file instead of growing a BytesIO
+        memory_file = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX_SIZE)
+        # ZipFile emits many small header/CRC writes; batch them before they hit the spool
+        buffered_file = io.BufferedWriter(memory_file, buffer_size=ZIP_WRITE_BUFFER_SIZE)
+        with zipfile.ZipFile(buffered_file, 'w', zipfile.ZIP_DEFLATED) as zf:
             session_data = session.get('session_data', {})
-            processed_files_details = session_data.get('processed_files_details', [])
+            processed_files_details = get_processed_files_details(session_data)
             
             for filename in files_in_folder:
                 file_path = os.path.join(session_folder, filename)
-                if os.path.isfile(file_path):
-                    display_name_in_zip = filename # Default
-                    for file_info in processed_files_details:
-                        if file_info.get('stored_name') == filename:
-                            display_name_in_zip = file_info.get('display_name', filename)
-                            break
-                    
-                    zf.write(file_path, display_name_in_zip)
+                file_info = processed_files_details.get(filename)
+                display_name_in_zip = file_info.get('display_name', filename) if file_info else filename
+                
+                zf.write(file_path, display_name_in_zip)
         
+        buffered_file.flush()
+        buffered_file.detach()  # Keep memory_file open for send_file
         memory_file.seek(0)
         
         zip_filename = f"processed_files_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
@@ -1192,22 +1244,18 @@ def rename_file(filename):
         
         # Update session data
         session_data = session.get('session_data', {})
-        
-        # Update processed_files list
-        if filename in session_data.get('processed_files', []):
-            idx = session_data['processed_files'].index(filename)
-            session_data['processed_files'][idx] = new_stored_name
             
         # Update file_times
         if filename in session_data.get('file_times', {}):
             session_data['file_times'][new_stored_name] = session_data['file_times'].pop(filename)
             
         # Update processed_files_details
-        for f_info in session_data.get('processed_files_details', []):
-            if f_info.get('stored_name') == filename:
-                f_info['stored_name'] = new_stored_name
-                f_info['display_name'] = new_display_name_raw + original_ext # Display name should include extension
-                break
+        processed_details = get_processed_files_details(session_data)
+        f_info = processed_details.pop(filename, None)
+        if f_info is not None:
+            f_info['stored_name'] = new_stored_name
+            f_info['display_name'] = new_display_name_raw + original_ext # Display name should include extension
+            processed_details[new_stored_name] = f_info
             
         session['session_data'] = session_data
         
@@ -1239,20 +1287,13 @@ def cleanup_single_file(filename):
         
         # Update session data
         session_data = session.get('session_data', {})
-        
-        # Remove from processed_files list
-        if filename in session_data.get('processed_files', []):
-            session_data['processed_files'].remove(filename)
             
         # Remove from file_times
         if filename in session_data.get('file_times', {}):
             session_data['file_times'].pop(filename)
             
         # Remove from processed_files_details
-        session_data['processed_files_details'] = [
-            f for f in session_data.get('processed_files_details', [])
-            if f.get('stored_name') != filename
-        ]
+        get_processed_files_details(session_data).pop(filename, None)
             
         session['session_data'] = session_data
         
@@ -1289,7 +1330,7 @@ def cleanup_session():
             
             # Reset session data completely
             session.pop('preview_data', None)
-            session['session_data'] = SessionData().__dict__ # Re-initialize session data
+            session['session_data'] = empty_session_data() # Re-initialize session data
             
             return jsonify({
                 "status": "success",
@@ -1306,9 +1347,9 @@ def cleanup_session():
             
             # Clear only processed file tracking in session data
             session_data = session.get('session_data', {})
-            session_data['processed_files'] = []
+            session_data.pop('processed_files', None)
             session_data['file_times'] = {}
-            session_data['processed_files_details'] = []
+            session_data['processed_files_details'] = {}
             session['session_data'] = session_data
             
             return jsonify({
@@ -1338,7 +1379,7 @@ def clear_session():
             logger.info(f"{get_session_context()} Manually cleared session folders for session: {session_id}")
         
         session.pop('preview_data', None)
-        session['session_data'] = SessionData().__dict__
+        session['session_data'] = empty_session_data()
         
         return jsonify({
             "success": True,
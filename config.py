@@ -27,7 +27,7 @@ class Config:
     MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # Flask request limit
     
     # 🔹 Allowed file extensions
-    ALLOWED_EXTENSIONS = {'pdf'}
+    ALLOWED_EXTENSIONS = frozenset({'pdf'})
     
     # ⏰ Session settings - CORRECTED TO 10 MINUTES
     PERMANENT_SESSION_LIFETIME = timedelta(minutes=10)
@@ -39,6 +39,7 @@ class Config:
     UPLOAD_FILE_RETENTION = 10      # 10 minutes for uploads
     PREVIEW_FILE_RETENTION = 10     # 10 minutes for previews  
     PROCESSED_FILE_RETENTION = 10   # 10 minutes for processed files
+    THUMBNAIL_CACHE_MAX_MB = 200    # Shared thumbnail cache, pruned least-recently-used first
     
     @classmethod
     def init_app(cls, app):
@@ -74,6 +75,7 @@ class Config:
         app.config['UPLOAD_RETENTION_MINUTES'] = cls.UPLOAD_FILE_RETENTION
         app.config['PREVIEW_RETENTION_MINUTES'] = cls.PREVIEW_FILE_RETENTION
         app.config['PROCESSED_RETENTION_MINUTES'] = cls.PROCESSED_FILE_RETENTION
+        app.config['THUMBNAIL_CACHE_MAX_MB'] = cls.THUMBNAIL_CACHE_MAX_MB
     
     @classmethod
     def get_absolute_path(cls, relative_path):
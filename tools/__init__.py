@@ -1,16 +1,29 @@
 # tools/__init__.py
-from .split_tool import split_pdf
-from .merge_tool import merge_pdfs
-from .rotate_tool import rotate_pdf
-from .compress_tool import compress_pdf
-from .pdf_to_word_tool import pdf_to_word
-from .pdf_to_excel_tool import pdf_to_excel
-from .pdf_to_ppt_tool import pdf_to_ppt
-from .pdf_to_jpg_tool import pdf_to_jpg
-from .pdf_to_text_tool import pdf_to_text
-from .ocr_tool import ocr_pdf
-from .unlock_pdf_tool import unlock_pdf
-from .protect_pdf_tool import protect_pdf
+import importlib
+
+# Tool functions are imported on first access so that importing the package (e.g. for
+# tools.generic_tools) doesn't pull in pdf2docx, openpyxl, pytesseract, ... up front
+_LAZY_MAP = {
+    'split_pdf': 'tools.split_tool',
+    'merge_pdfs': 'tools.merge_tool',
+    'rotate_pdf': 'tools.rotate_tool',
+    'compress_pdf': 'tools.compress_tool',
+    'pdf_to_word': 'tools.pdf_to_word_tool',
+    'pdf_to_excel': 'tools.pdf_to_excel_tool',
+    'pdf_to_ppt': 'tools.pdf_to_ppt_tool',
+    'pdf_to_jpg': 'tools.pdf_to_jpg_tool',
+    'pdf_to_text': 'tools.pdf_to_text_tool',
+    'ocr_pdf': 'tools.ocr_tool',
+    'unlock_pdf': 'tools.unlock_pdf_tool',
+    'protect_pdf': 'tools.protect_pdf_tool',
+}
+
+def __getattr__(name):
+    if name in _LAZY_MAP:
+        value = getattr(importlib.import_module(_LAZY_MAP[name]), name)
+        globals()[name] = value  # Later lookups skip __getattr__
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     'split_pdf',
@@ -1,7 +1,11 @@
 # tools/compress_tool.py
 import os
+import io
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import fitz  # PyMuPDF
+from PIL import Image, ImageChops
 from utils.file_utils import validate_file_size
 from utils.file_manager import get_session_processed_folder  # CHANGED
 from utils.file_naming_utils import generate_file_names
@@ -9,6 +13,109 @@ from utils.file_naming_utils import generate_file_names
 # Set up logger
 logger = logging.getLogger(__name__)
 
+# Pillow modes that are kept as grayscale; other 8-bit modes (CMYK, palette) become RGB
+_GRAY_MODES = frozenset(('1', 'L'))
+# Modes that can't be flattened to 8-bit L/RGB without losing alpha or bit depth; left as-is
+_UNSUPPORTED_MODES = frozenset(('LA', 'La', 'RGBA', 'RGBa', 'PA', 'I', 'I;16', 'I;16B', 'I;16L', 'F'))
+
+# Image.Quantize was added in Pillow 9.1
+_MEDIANCUT = getattr(Image, 'Quantize', Image).MEDIANCUT
+
+# Source formats that are re-encoded as JPEG and embedded as-is instead of via a raw pixmap
+_JPEG_EXTENSIONS = frozenset(('jpeg', 'jpg'))
+
+# Below this compression_quality images also lose bit depth (grayscale or 256-colour palette)
+_REDUCED_DEPTH_QUALITY = 0.5
+# Max per-pixel difference between RGB channels for an image to count as grayscale
+_GRAY_TOLERANCE = 8
+
+def _is_near_gray(im):
+    """True if an RGB image's channels (almost) never differ, i.e. it is effectively grayscale"""
+    r, g, b = im.split()
+    return (ImageChops.difference(r, g).getextrema()[1] <= _GRAY_TOLERANCE and
+            ImageChops.difference(b, g).getextrema()[1] <= _GRAY_TOLERANCE)
+
+def _downscale_image(xref, img_bytes, ext, scale):
+    """
+    Decode an embedded image and shrink it by scale with Pillow.
+    JPEG sources are re-encoded as JPEG and returned as ('stream', bytes), or None when that
+    would not make them smaller; other images are returned as ('pixmap', (mode, (width, height), samples)).
+    Below _REDUCED_DEPTH_QUALITY, near-gray images become grayscale and other images may be
+    returned as a ('stream', bytes) grayscale or palette PNG.
+    Returns None if the image can't be decoded, or has alpha or more than 8 bits per channel.
+    Safe to run in worker threads: no PyMuPDF objects are touched.
+    """
+    try:
+        with Image.open(io.BytesIO(img_bytes)) as im:
+            if im.mode in _UNSUPPORTED_MODES or 'transparency' in im.info:
+                return None  # Keep transparency and high-bit-depth images untouched
+            im = im.convert('L' if im.mode in _GRAY_MODES else 'RGB')
+            scale = min(scale, 1.0)  # Never upscale
+            size = (max(1, int(im.width * scale)), max(1, int(im.height * scale)))
+
+            reduce_depth = scale < _REDUCED_DEPTH_QUALITY
+            if reduce_depth and im.mode == 'RGB' and _is_near_gray(im):
+                im = im.convert('L')
+
+            if ext in _JPEG_EXTENSIONS:
+                im.thumbnail(size, Image.LANCZOS)
+                buf = io.BytesIO()
+                im.save(buf, "JPEG", quality=max(1, int(85 * scale)), optimize=True)
+                if buf.tell() >= len(img_bytes):
+                    return None  # Re-encoding would grow the image; keep the original
+                return 'stream', buf.getvalue()
+
+            if size != im.size:
+                im = im.resize(size, Image.LANCZOS)
+
+            if reduce_depth:
+                # 8-bit grayscale or palette PNG; falls through to the raw pixmap if it isn't smaller
+                reduced = im if im.mode == 'L' else im.quantize(colors=256, method=_MEDIANCUT)
+                buf = io.BytesIO()
+                reduced.save(buf, "PNG", optimize=True)
+                if buf.tell() < len(img_bytes):
+                    return 'stream', buf.getvalue()
+
+            return 'pixmap', (im.mode, im.size, im.tobytes())
+    except Exception as e:
+        logger.warning(f"Could not process image {xref}: {e}")
+        return None
+
+def _iter_unique_images(doc):
+    """
+    Yield (xref, page_number) for each distinct embedded image; shared images appear once.
+    Images with a soft mask (alpha) or more than 8 bits per component are skipped:
+    replace_image would drop the mask, and Pillow would clip the extra depth.
+    """
+    seen_xrefs = set()
+    for page in doc:
+        for img in page.get_images(full=True):
+            xref, smask, bpc = img[0], img[1], img[4]
+            if xref in seen_xrefs:
+                continue
+            seen_xrefs.add(xref)
+            if smask or bpc > 8:
+                continue
+            yield xref, page.number
+
+def _write_back(doc, xref, page_number, future):
+    """Replace one image with its downscaled result once the worker has finished it"""
+    result = future.result()
+    if result is None:
+        return
+    kind, data = result
+    try:
+        if kind == 'stream':
+            # Embed the JPEG bytes directly so PyMuPDF doesn't re-encode them
+            doc[page_number].replace_image(xref, stream=data)
+            return
+        mode, size, samples = data
+        colorspace = fitz.csGRAY if mode == 'L' else fitz.csRGB
+        doc[page_number].replace_image(
+            xref, pixmap=fitz.Pixmap(colorspace, size[0], size[1], samples, False))
+    except Exception as e:
+        logger.warning(f"Could not process image {xref}: {e}")
+
 def compress_pdf(file_path, pages=None, compression_quality=0.5):
     """Compress PDF by downsampling images with optional page selection"""
     try:
@@ -50,38 +157,27 @@ def compress_pdf(file_path, pages=None, compression_quality=0.5):
                     'message': "No valid pages selected for compression"
                 }
             
-            # Create new document with selected pages
-            new_doc = fitz.open()
-            for page_num in pages:
-                new_doc.insert_pdf(doc, from_page=page_num, to_page=page_num)
-            doc.close()
-            doc = new_doc
+            # Keep only the selected pages, in place (one pass instead of a copy per page)
+            doc.select(pages)
         
-        # Downsample embedded images
-        for page in doc:
-            images = page.get_images(full=True)
-            for img in images:
-                xref = img[0]
+        # Decode and downsample on threads (Pillow releases the GIL); extracting and writing
+        # back stay on this thread since PyMuPDF is not thread-safe. Only a window of
+        # max_workers images is in flight, so memory doesn't grow with the document.
+        max_workers = os.cpu_count() or 1
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for xref, page_number in _iter_unique_images(doc):
                 try:
                     base_image = doc.extract_image(xref)
-                    img_bytes = base_image["image"]
-
-                    pix = fitz.Pixmap(img_bytes)
-
-                    # Convert CMYK → RGB if needed
-                    if pix.n > 4:
-                        pix = fitz.Pixmap(fitz.csRGB, pix)
-
-                    # Scale down based on quality
-                    scaled = fitz.Pixmap(pix, compression_quality)
-
-                    doc.update_image(xref, scaled)
-
-                    pix = None
-                    scaled = None
                 except Exception as e:
                     logger.warning(f"Could not process image {xref}: {e}")
                     continue  # skip corrupt images
+                pending.append((xref, page_number, executor.submit(
+                    _downscale_image, xref, base_image["image"], base_image["ext"], compression_quality)))
+                if len(pending) >= max_workers:
+                    _write_back(doc, *pending.popleft())
+            while pending:
+                _write_back(doc, *pending.popleft())
 
         # Save compressed PDF
         doc.save(out_path, deflate=True, garbage=4, clean=True)
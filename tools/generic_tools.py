@@ -5,24 +5,37 @@ import platform
 import traceback
 import tempfile
 import shutil
-from typing import Dict, List, Optional, Union, Callable, Any, Tuple
-from flask import current_app
+from typing import Dict, List, Optional, Union, Callable, Any, Tuple, Iterable, Iterator
+from flask import current_app, has_app_context
 from PyPDF2 import PdfReader
 import fitz
 import zipfile
 import time
 from functools import wraps, lru_cache
+from dataclasses import dataclass
 from datetime import datetime
 import uuid
+import hashlib
+import importlib
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures.process import BrokenProcessPool
 
 # Import from utils
-from utils.file_utils import validate_file_size, validate_total_file_size, cleanup_temp_files
-from utils.file_manager import get_session_folder
-from utils.file_naming_utils import generate_file_names
+from utils.file_utils import validate_file_size, validate_total_file_size, get_file_sizes, cleanup_temp_files
+from utils.file_manager import get_session_folder, get_thumbnail_cache_folder, link_or_copy as _link_or_copy
+from utils.file_naming_utils import generate_file_names, generate_file_names_batch
+from utils.pdf_cache import get_cached_pdf as _get_doc
+from utils.worker_pool import WORKER_POOL_SIZE, get_worker_pool, discard_worker_pool
+
+# Fail at import time rather than per page if PyMuPDF renames its render API again
+if not hasattr(fitz.Page, 'get_pixmap'):
+    raise ImportError("Installed PyMuPDF has no Page.get_pixmap; upgrade PyMuPDF")
 
 # ------------------- Configuration -------------------
 class ToolConfig:
-    ALLOWED_EXTENSIONS = {'pdf'}
+    ALLOWED_EXTENSIONS = frozenset({'pdf'})
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
     DEFAULT_PREVIEW_PAGES = 3
     MAX_CONCURRENT_PROCESSES = 4
@@ -30,6 +43,16 @@ class ToolConfig:
     THUMBNAIL_DPI = 100  # DPI for thumbnail generation
     MAX_THUMBNAILS_PER_FILE = 50  # Limit to prevent memory issues
     HIGH_QUALITY_DPI = 300  # High quality DPI for conversions
+    PARALLEL_RENDER_MIN_PAGES = 4  # Below this, a process pool costs more than it saves
+    PREVIEW_MAX_DPI = 72  # Previews are rendered natively at low DPI instead of downscaled
+    PDF_INFO_CACHE_MAXSIZE = 256  # Cached page counts / password checks
+    HEALTH_SAMPLE_INTERVAL = 5  # Seconds between psutil samples for health_check
+    IMAGE_WRITE_BUFFER_SIZE = 1 << 16  # Buffer for writing encoded JPEG bytes
+    MUPDF_STORE_SHRINK_PERCENT = 100  # Empty MuPDF's resource store after each rendered page
+    ZIP_STORED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.pdf', '.docx', '.xlsx', '.pptx', '.zip'}  # Already compressed
+    ZIP_DEFLATE_LEVEL = 1  # Fastest deflate; higher levels gain little on mixed text
+    ZIP_WRITE_BUFFER_SIZE = 1 << 20  # Output buffer for ZIP archives written to disk
+    ZIP_COPY_CHUNK_SIZE = 1 << 20  # Read size when copying stored entries into a ZIP
 
 # ------------------- Logging Setup -------------------
 logger = logging.getLogger(__name__)
@@ -37,18 +60,25 @@ logger.setLevel(logging.INFO)
 
 # ------------------- Utility Functions -------------------
 def rate_limited(max_per_minute: int):
-    """Decorator to limit function execution rate"""
-    min_interval = 60.0 / max_per_minute
+    """
+    Decorator to limit function execution rate.
+    Sliding-window limiter: calls pass immediately until max_per_minute calls
+    have started within the last 60 seconds, then wait for the oldest to expire.
+    """
     def decorator(func):
-        last_time_called = 0.0
+        call_times = deque(maxlen=max_per_minute)  # Start times of recent calls (monotonic)
+        lock = threading.Lock()
         @wraps(func)
         def rate_limited_function(*args, **kwargs):
-            nonlocal last_time_called
-            elapsed = time.time() - last_time_called
-            left_to_wait = min_interval - elapsed
-            if left_to_wait > 0:
-                time.sleep(left_to_wait)
-            last_time_called = time.time()
+            with lock:
+                now = time.monotonic()
+                start_at = now
+                if len(call_times) == max_per_minute:
+                    start_at = max(now, call_times[0] + 60.0)
+                # Reserve the slot before sleeping so concurrent callers queue behind it
+                call_times.append(start_at)
+            if start_at > now:
+                time.sleep(start_at - now)
             return func(*args, **kwargs)
         return rate_limited_function
     return decorator
@@ -64,40 +94,134 @@ def validate_page_selections(page_selection: Dict, max_pages: int) -> bool:
             return False
     return True
 
+def _validate_batch(selections: Dict[str, List[int]], page_counts: Dict[str, int]) -> set:
+    """Return the filenames whose selected pages fall outside their page count"""
+    return {
+        filename for filename, pages in selections.items()
+        if any(page < 1 or page > page_counts[filename] for page in pages)
+    }
+
 # ------------------- Check if PDF is encrypted -------------------
 def is_pdf_encrypted(pdf_path: str) -> bool:
     """Check if a PDF file is encrypted"""
     try:
-        with open(pdf_path, 'rb') as f:
-            reader = PdfReader(f)
-            return reader.is_encrypted
+        # MuPDF only reads the trailer and xref on open; the cache makes repeat checks free
+        with _get_doc(pdf_path) as doc:
+            # Owner-password-only files are opened (authenticated) automatically, so
+            # is_encrypted/needs_pass are False; the encryption metadata still reports them
+            return bool(doc.is_encrypted or doc.needs_pass or (doc.metadata or {}).get('encryption'))
     except Exception as e:
         logger.error(f"Error checking if PDF is encrypted: {e}")
         return False
 
+# ------------------- Render Worker Pool -------------------
+# PyMuPDF holds the GIL while rendering and is not thread-safe, so large batches of pages
+# are rendered on the shared worker process pool (utils.worker_pool).
+
 # Define the placeholder filename
 PLACEHOLDER_FILENAME = "no_preview_available.jpg"
 
 # ------------------- Generate Preview Thumbnails -------------------
+# Colorspaces are passed by name so render arguments stay picklable for worker processes
+_COLORSPACES = {
+    'gray': fitz.csGRAY,
+    'rgb': fitz.csRGB,
+}
+
+def _write_jpeg(pix: "fitz.Pixmap", path: str, quality: int) -> None:
+    """Encode a pixmap to JPEG in memory and write it with a single buffered write"""
+    data = pix.tobytes(output="jpeg", jpg_quality=quality)
+    with open(path, 'wb', buffering=ToolConfig.IMAGE_WRITE_BUFFER_SIZE) as f:
+        f.write(data)
+
+def _shrink_mupdf_store() -> None:
+    """Release MuPDF's cached page resources so batch rendering does not grow RSS"""
+    fitz.TOOLS.store_shrink(ToolConfig.MUPDF_STORE_SHRINK_PERCENT)
+
+def _render_page_to_jpeg(pdf_path: str, page_num: int, zoom: float, preview_folder: str,
+                         thumb_filename: str, quality: int = 85, colorspace: str = 'gray') -> Optional[str]:
+    """
+    Render a single page to a JPEG thumbnail named thumb_filename and return that name.
+    Top-level so it can run in a worker process; each call opens its own
+    document since MuPDF handles cannot be shared across processes.
+    """
+    try:
+        doc = fitz.open(pdf_path)
+        try:
+            page = doc.load_page(page_num)
+            
+            # Create pixmap without alpha; grayscale previews need 1 byte/pixel instead of 3-4
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom),
+                                  colorspace=_COLORSPACES.get(colorspace, fitz.csRGB), alpha=False)
+            
+            thumb_path = os.path.join(preview_folder, thumb_filename)
+            
+            # Save as JPEG
+            _write_jpeg(pix, thumb_path, quality)
+            return thumb_filename
+        finally:
+            doc.close()
+            _shrink_mupdf_store()
+    except Exception as e:
+        logger.warning(f"Failed to process page {page_num + 1}: {e}")
+        return None
+
+# ------------------- Thumbnail Cache -------------------
+@lru_cache(maxsize=256)
+def _pdf_content_key(pdf_path: str, mtime_ns: int, size: int) -> str:
+    """blake2b digest of the file content; (path, mtime, size) memoizes it per upload"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(pdf_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _thumbnail_from_cache(cache_path: str, preview_folder: str, thumb_filename: str) -> Optional[str]:
+    """Place a cached thumbnail in preview_folder as thumb_filename, or return None on a miss"""
+    try:
+        # Touch first: refreshes the LRU timestamp and fails fast on a miss
+        os.utime(cache_path)
+        _link_or_copy(cache_path, os.path.join(preview_folder, thumb_filename))
+        return thumb_filename
+    except OSError:
+        return None
+
+def _store_thumbnail_in_cache(thumb_path: str, cache_path: str) -> None:
+    """Add a freshly rendered thumbnail to the cache (another request may have won the race)"""
+    try:
+        _link_or_copy(thumb_path, cache_path)
+    except FileExistsError:
+        pass
+    except OSError as e:
+        logger.debug(f"Could not cache thumbnail {thumb_path}: {e}")
+
 def generate_preview_thumbnails(pdf_path: str, preview_folder: Optional[str] = None,
                                max_pages: Optional[int] = None, dpi: int = 100,
                                password: Optional[str] = None,
-                               skip_if_encrypted: bool = False) -> List[str]:
+                               skip_if_encrypted: bool = False,
+                               colorspace: str = 'gray') -> List[str]:
     """
     Generates preview thumbnails for PDF pages using PyMuPDF.
     If max_pages is None, generates thumbnails for ALL pages.
     If max_pages is specified, generates only that many thumbnails.
+    dpi is capped at ToolConfig.PREVIEW_MAX_DPI; pass colorspace='rgb'
+    for color previews (default is grayscale).
+    Thumbnails are cached by file content, page, DPI and colorspace in
+    CACHE_FOLDER/thumbnails, so re-uploads skip rendering. Pages that miss
+    are rendered on the shared worker process pool once there are enough of
+    them to outweigh the dispatch cost.
     """
     if preview_folder is None:
         preview_folder = get_session_folder(current_app.config.get('PREVIEWS_FOLDER', 'previews'))
 
     os.makedirs(preview_folder, exist_ok=True)
-    thumbnails = []
+    pages_to_process = 0
 
     try:
-        # Open PDF with PyMuPDF
-        doc = fitz.open(pdf_path)
-        total_pages = len(doc)
+        # Page count and encryption come from the cached document; workers open their own
+        with _get_doc(pdf_path) as doc:
+            total_pages = len(doc)
+            is_encrypted = doc.is_encrypted
 
         # Determine how many pages to process
         if max_pages is None:
@@ -109,203 +233,285 @@ def generate_preview_thumbnails(pdf_path: str, preview_folder: Optional[str] = N
         pages_to_process = min(pages_to_process, ToolConfig.MAX_THUMBNAILS_PER_FILE)
 
         # Check for encrypted files and skip preview if requested
-        if skip_if_encrypted and doc.is_encrypted:
+        if skip_if_encrypted and is_encrypted:
             logger.info(f"Skipping preview generation for encrypted PDF: {pdf_path}")
-            doc.close()
             return [PLACEHOLDER_FILENAME] * pages_to_process if pages_to_process > 0 else []
 
         base_name = os.path.splitext(os.path.basename(pdf_path))[0]
         
-        # Process pages
-        for page_num in range(pages_to_process):
+        # One shared UUID prefix for the whole batch of thumbnail names
+        thumb_names = [names['stored_name'] for names in generate_file_names_batch(
+            [f"{base_name}_page{page_num+1}.jpg" for page_num in range(pages_to_process)], toolname='preview')]
+        
+        # Calculate zoom factor based on DPI (approximate conversion)
+        dpi = min(dpi, ToolConfig.PREVIEW_MAX_DPI)
+        zoom = dpi / 72  # 72 is the default PDF DPI
+        
+        # Reuse thumbnails already rendered for identical content in any session
+        thumbnails: List[Optional[str]] = [None] * pages_to_process
+        cache_paths = {}
+        if has_app_context():
+            cache_folder = get_thumbnail_cache_folder()
+            st = os.stat(pdf_path)
+            file_key = _pdf_content_key(os.path.abspath(pdf_path), st.st_mtime_ns, st.st_size)
+            for page_num in range(pages_to_process):
+                cache_paths[page_num] = os.path.join(cache_folder, f"{file_key}_{page_num}_{dpi}_{colorspace}.jpg")
+                thumbnails[page_num] = _thumbnail_from_cache(cache_paths[page_num], preview_folder, thumb_names[page_num])
+        
+        render_args = [
+            (pdf_path, page_num, zoom, preview_folder, thumb_names[page_num], 85, colorspace)
+            for page_num in range(pages_to_process) if thumbnails[page_num] is None
+        ]
+        
+        # Process pages that were not cached
+        if len(render_args) >= ToolConfig.PARALLEL_RENDER_MIN_PAGES:
+            pool = get_worker_pool()
             try:
-                page = doc.load_page(page_num)
-                
-                # Calculate zoom factor based on DPI (approximate conversion)
-                zoom = dpi / 72  # 72 is the default PDF DPI
-                mat = fitz.Matrix(zoom, zoom)
-                
-                # Create pixmap
-                pix = page.get_pixmap(matrix=mat)
-                
-                # Generate secure filename
-                file_names = generate_file_names(f"{base_name}_page{page_num+1}.jpg", toolname='preview')
-                thumb_filename = file_names['stored_name']
-                thumb_path = os.path.join(preview_folder, thumb_filename)
-                
-                # Save as JPEG
-                pix.save(thumb_path, output="jpeg", jpg_quality=85)
-                thumbnails.append(thumb_filename)
-                
-            except Exception as e:
-                logger.warning(f"Failed to process page {page_num + 1}: {e}")
-                continue
+                rendered = list(pool.map(_render_page_to_jpeg, *zip(*render_args)))
+            except BrokenProcessPool:
+                logger.warning("Render worker pool broke; rendering pages in-process")
+                discard_worker_pool(pool)
+                rendered = [_render_page_to_jpeg(*args) for args in render_args]
+        else:
+            rendered = [_render_page_to_jpeg(*args) for args in render_args]
+        
+        for args, thumb in zip(render_args, rendered):
+            page_num = args[1]
+            thumbnails[page_num] = thumb
+            if thumb and page_num in cache_paths:
+                _store_thumbnail_in_cache(os.path.join(preview_folder, thumb), cache_paths[page_num])
 
-        doc.close()
-        return thumbnails
+        # Results are in page order; drop pages that failed to render
+        return [thumb for thumb in thumbnails if thumb]
 
     except Exception as e:
         logger.error(f"Thumbnail generation failed for {pdf_path}: {e}")
-        try:
-            doc.close()
-        except:
-            pass
         # If thumbnail generation fails, return placeholders
         return [PLACEHOLDER_FILENAME] * pages_to_process if pages_to_process > 0 else []
 
 # ------------------- Generate High Quality Images -------------------
-def generate_high_quality_images(pdf_path: str, output_folder: str, pages: List[int] = None, 
-                                dpi: int = 300, quality: int = 95) -> List[str]:
+def _render_page_to_jpeg_bytes(pdf_path: str, page_num: int, zoom: float, quality: int) -> Optional[bytes]:
     """
-    Generate high quality images from PDF using PyMuPDF.
-    Returns list of generated image file paths.
+    Render a single page at full quality and return the JPEG bytes.
+    Top-level so it can run in a render worker process, which opens its own document.
     """
-    os.makedirs(output_folder, exist_ok=True)
-    images = []
-    
     try:
         doc = fitz.open(pdf_path)
-        total_pages = len(doc)
-        
-        # Determine which pages to process
-        if pages:
-            page_indices = [p-1 for p in pages if 1 <= p <= total_pages]
-        else:
-            page_indices = range(total_pages)
-        
-        if not page_indices:
+        try:
+            pix = doc.load_page(page_num).get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            return pix.tobytes(output="jpeg", jpg_quality=quality)
+        finally:
             doc.close()
-            return []
-        
-        # Calculate zoom factor for high DPI
-        zoom = dpi / 72
-        mat = fitz.Matrix(zoom, zoom)
-        
-        base_name = os.path.splitext(os.path.basename(pdf_path))[0]
-        
-        for page_num in page_indices:
-            try:
-                page = doc.load_page(page_num)
-                
-                # Create high quality pixmap
-                pix = page.getpixmap(matrix=mat)
-                
-                # Generate secure filename
-                file_names = generate_file_names(f"{base_name}_page{page_num+1}.jpg", toolname='jpg')
-                img_filename = file_names['stored_name']
-                img_path = os.path.join(output_folder, img_filename)
-                
-                # Save as high quality JPEG
-                pix.save(img_path, output="jpeg", jpg_quality=quality)
-                images.append(img_path)
-                
-            except Exception as e:
-                logger.warning(f"Failed to process page {page_num + 1} for high quality image: {e}")
-                continue
-        
-        doc.close()
-        return images
-        
+            _shrink_mupdf_store()
+    except Exception as e:
+        logger.warning(f"Failed to process page {page_num + 1} for high quality image: {e}")
+        return None
+
+def _iter_rendered_pages(render_args: List[Tuple[str, int, float, int]]) -> Iterator[Optional[bytes]]:
+    """
+    Yield JPEG bytes (None for failed pages) in page order. Large batches go to the
+    render process pool with only a small window of pages in flight, so at most a
+    few encoded pages are held in memory at once.
+    """
+    if len(render_args) < ToolConfig.PARALLEL_RENDER_MIN_PAGES:
+        for args in render_args:
+            yield _render_page_to_jpeg_bytes(*args)
+        return
+    
+    pool = get_worker_pool()
+    window = 2 * WORKER_POOL_SIZE
+    pending = deque()
+    done = 0
+    try:
+        for args in render_args:
+            pending.append(pool.submit(_render_page_to_jpeg_bytes, *args))
+            if len(pending) >= window:
+                data = pending.popleft().result()
+                done += 1
+                yield data
+        while pending:
+            data = pending.popleft().result()
+            done += 1
+            yield data
+    except BrokenProcessPool:
+        logger.warning("Render worker pool broke; rendering remaining pages in-process")
+        discard_worker_pool(pool)
+        for args in render_args[done:]:
+            yield _render_page_to_jpeg_bytes(*args)
+
+def iter_high_quality_images(pdf_path: str, pages: List[int] = None,
+                             dpi: int = 300, quality: int = 95) -> Iterator[Tuple[str, bytes]]:
+    """
+    Generate high quality images from PDF using PyMuPDF, one page at a time.
+    Yields (stored filename, JPEG bytes) in page order; pages that fail are skipped.
+    """
+    try:
+        with _get_doc(pdf_path) as doc:
+            total_pages = len(doc)
+    except Exception as e:
+        logger.error(f"High quality image generation failed for {pdf_path}: {e}")
+        return
+    
+    # Determine which pages to process
+    if pages:
+        page_indices = [p-1 for p in pages if 1 <= p <= total_pages]
+    else:
+        page_indices = list(range(total_pages))
+    
+    if not page_indices:
+        return
+    
+    # Calculate zoom factor for high DPI
+    zoom = dpi / 72
+    
+    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    
+    # Generate secure filenames for the whole batch with one shared UUID prefix
+    image_names = generate_file_names_batch(
+        [f"{base_name}_page{page_num+1}.jpg" for page_num in page_indices], toolname='jpg')
+    
+    render_args = [(pdf_path, page_num, zoom, quality) for page_num in page_indices]
+    for file_names, data in zip(image_names, _iter_rendered_pages(render_args)):
+        if data:
+            yield file_names['stored_name'], data
+
+def generate_high_quality_images(pdf_path: str, pages: List[int] = None,
+                                dpi: int = 300, quality: int = 95) -> List[Tuple[str, bytes]]:
+    """
+    Generate high quality images from PDF using PyMuPDF.
+    Returns list of (stored filename, JPEG bytes) tuples; nothing is written to disk.
+    Prefer iter_high_quality_images when the pages can be consumed one at a time.
+    """
+    try:
+        return list(iter_high_quality_images(pdf_path, pages=pages, dpi=dpi, quality=quality))
     except Exception as e:
         logger.error(f"High quality image generation failed for {pdf_path}: {e}")
-        try:
-            doc.close()
-        except:
-            pass
         return []
     
 # ------------------- Get PDF Page Count -------------------
-@lru_cache(maxsize=100)
+@lru_cache(maxsize=ToolConfig.PDF_INFO_CACHE_MAXSIZE)
+def _cached_page_count(filepath: str, mtime: float) -> int:
+    """Page count keyed on (path, mtime) so a replaced file is re-read"""
+    with _get_doc(filepath) as doc:
+        return doc.page_count
+
 def get_pdf_page_count(filepath: str) -> int:
     """Get PDF page count with caching, handles encrypted files"""
     try:
-        # Use PyPDF2 to get page count
-        with open(filepath, 'rb') as f:
-            reader = PdfReader(f)
-            if reader.is_encrypted:
-                try:
-                    # Attempt to get page count for encrypted files
-                    return len(reader.pages)
-                except Exception:
-                    logger.warning(f"Could not get page count for encrypted PDF {filepath} using PyPDF2.")
-                    return 0  # Cannot determine page count for encrypted file without password
-            else:
-                return len(reader.pages)
+        # MuPDF reads the page tree without decoding content; works on encrypted files too
+        return _cached_page_count(filepath, os.path.getmtime(filepath))
     except Exception as e:
-        logger.error(f"Failed to get page count for {filepath} using PyPDF2: {e}")
+        logger.error(f"Failed to get page count for {filepath}: {e}")
         return 0
 
 # ------------------- Helper Function: Create ZIP -------------------
+@contextmanager
+def _open_zip_for_write(zip_path: str):
+    """Open a ZIP for writing through a large buffer so header/CRC writes are coalesced"""
+    with open(zip_path, 'wb', buffering=ToolConfig.ZIP_WRITE_BUFFER_SIZE) as f:
+        with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED,
+                             compresslevel=ToolConfig.ZIP_DEFLATE_LEVEL, allowZip64=True) as zipf:
+            yield zipf
+
+def _zip_compress_type(name: str) -> int:
+    """Store already-compressed payloads as-is; deflate everything else"""
+    if os.path.splitext(name)[1].lower() in ToolConfig.ZIP_STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+def _zip_write_file(zipf: zipfile.ZipFile, file_path: str, arcname: str) -> None:
+    """
+    Add a file from disk. Stored (already-compressed) entries are copied in large chunks
+    straight into the archive; ZipFile.write would read them 8 KB at a time.
+    Split/merge PDFs always land here: their streams are already Flate-compressed, so
+    callers should not force DEFLATE on them. The entry CRC comes from zlib.crc32.
+    """
+    compress_type = _zip_compress_type(arcname)
+    if compress_type != zipfile.ZIP_STORED:
+        zipf.write(file_path, arcname=arcname, compress_type=compress_type)
+        return
+    
+    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)  # Stored by default; file_size sizes ZIP64
+    with open(file_path, 'rb') as src, zipf.open(zinfo, 'w') as dest:
+        shutil.copyfileobj(src, dest, ToolConfig.ZIP_COPY_CHUNK_SIZE)
+
 def create_zip_from_files(file_list: List[str], zip_prefix: str = "processed_files") -> str:
     """Create a ZIP archive from multiple files with a unique name."""
     processed_folder = get_session_folder(current_app.config.get('PROCESSED_FOLDER', 'processed'))
-    os.makedirs(processed_folder, exist_ok=True)
 
     # Generate unique filename using centralized function
     file_names = generate_file_names(f"{zip_prefix}.zip", toolname='zip')
     zip_name = file_names['stored_name']
     zip_path = os.path.join(processed_folder, zip_name)
 
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+    with _open_zip_for_write(zip_path) as zipf:
         for file_path in file_list:
-            if os.path.exists(file_path):
-                zipf.write(file_path, arcname=os.path.basename(file_path))
+            # Adding a file stats it anyway; a missing file is skipped without a separate exists() check
+            try:
+                _zip_write_file(zipf, file_path, os.path.basename(file_path))
+            except FileNotFoundError:
+                logger.warning(f"Skipping missing file in ZIP: {file_path}")
+
+    return zip_path
+
+def create_zip_from_buffers(items: Iterable[Tuple[str, bytes]], zip_prefix: str = "processed_files",
+                            zip_path: Optional[str] = None) -> str:
+    """
+    Create a ZIP archive from in-memory (arcname, data) pairs without temporary files.
+    items may be a generator; each entry is written as soon as it is produced.
+    """
+    if zip_path is None:
+        processed_folder = get_session_folder(current_app.config.get('PROCESSED_FOLDER', 'processed'))
+        zip_name = generate_file_names(f"{zip_prefix}.zip", toolname='zip')['stored_name']
+        zip_path = os.path.join(processed_folder, zip_name)
+
+    with _open_zip_for_write(zip_path) as zipf:
+        for arcname, data in items:
+            zipf.writestr(arcname, data, compress_type=_zip_compress_type(arcname))
 
     return zip_path
 
 # ------------------- Allowed Tools -------------------
+# tool_id -> (module, function); imported lazily to avoid circular imports
+_TOOL_SPECS = {
+    "split": ("tools.split_tool", "split_pdf"),
+    "merge": ("tools.merge_tool", "merge_pdfs"),
+    "rotate": ("tools.rotate_tool", "rotate_pdf"),
+    "compress": ("tools.compress_tool", "compress_pdf"),
+    "pdf-to-word": ("tools.pdf_to_word_tool", "pdf_to_word"),
+    "pdf-to-excel": ("tools.pdf_to_excel_tool", "pdf_to_excel"),
+    "pdf-to-ppt": ("tools.pdf_to_ppt_tool", "pdf_to_ppt"),
+    "pdf-to-jpg": ("tools.pdf_to_jpg_tool", "pdf_to_jpg"),
+    "pdf-to-text": ("tools.pdf_to_text_tool", "pdf_to_text"),
+    "ocr": ("tools.ocr_tool", "ocr_pdf"),
+    "unlock": ("tools.unlock_pdf_tool", "unlock_pdf"),
+    "protect": ("tools.protect_pdf_tool", "protect_pdf"),
+}
+
+@lru_cache(maxsize=1)
+def _init_tools() -> Dict[str, Callable]:
+    """Import every tool once and build the tool_id -> function dispatch table"""
+    registry: Dict[str, Callable] = {}
+    for tool_id, (module_name, func_name) in _TOOL_SPECS.items():
+        try:
+            registry[tool_id] = getattr(importlib.import_module(module_name), func_name)
+        except (ImportError, AttributeError) as e:
+            logger.error(f"Failed to import tool {tool_id}: {e}")
+    return registry
+
 def _get_tool_function(tool_id: str):
-    """Dynamically import tool function to avoid circular imports"""
-    try:
-        if tool_id == "split":
-            from tools.split_tool import split_pdf
-            return split_pdf
-        elif tool_id == "merge":
-            from tools.merge_tool import merge_pdfs
-            return merge_pdfs
-        elif tool_id == "rotate":
-            from tools.rotate_tool import rotate_pdf
-            return rotate_pdf
-        elif tool_id == "compress":
-            from tools.compress_tool import compress_pdf
-            return compress_pdf
-        elif tool_id == "pdf-to-word":
-            from tools.pdf_to_word_tool import pdf_to_word
-            return pdf_to_word
-        elif tool_id == "pdf-to-excel":
-            from tools.pdf_to_excel_tool import pdf_to_excel
-            return pdf_to_excel
-        elif tool_id == "pdf-to-ppt":
-            from tools.pdf_to_ppt_tool import pdf_to_ppt
-            return pdf_to_ppt
-        elif tool_id == "pdf-to-jpg":
-            from tools.pdf_to_jpg_tool import pdf_to_jpg
-            return pdf_to_jpg
-        elif tool_id == "pdf-to-text":
-            from tools.pdf_to_text_tool import pdf_to_text
-            return pdf_to_text
-        elif tool_id == "ocr":
-            from tools.ocr_tool import ocr_pdf
-            return ocr_pdf
-        elif tool_id == "unlock":
-            from tools.unlock_pdf_tool import unlock_pdf
-            return unlock_pdf
-        elif tool_id == "protect":
-            from tools.protect_pdf_tool import protect_pdf
-            return protect_pdf
-        else:
-            return None
-    except ImportError as e:
-        logger.error(f"Failed to import tool {tool_id}: {e}")
-        return None
+    """Look up a tool function in the preloaded dispatch table"""
+    return _init_tools().get(tool_id)
 
 # ------------------- Type Conversion Helper -------------------
+_TRUE = frozenset(('true', 'on', '1', 'yes'))
+
 def _convert_option_type(value: Any, target_type: type, default: Any = None) -> Any:
     """Converts a value to a target type, handling common string conversions."""
     if value is None:
         return default
     if target_type is bool:
-        return str(value).lower() in ['true', 'on', '1', 'yes']
+        return str(value).lower() in _TRUE
     if target_type is int:
         try:
             return int(value)
@@ -318,6 +524,132 @@ def _convert_option_type(value: Any, target_type: type, default: Any = None) ->
             return default
     return target_type(value)
 
+# ------------------- Tool Options -------------------
+# Form fields are coerced once per request into a typed, immutable options object
+@dataclass(slots=True, frozen=True)
+class MergeOpts:
+    file_order: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "MergeOpts":
+        return cls(file_order=tuple(d.get('file_order') or ()))
+
+@dataclass(slots=True, frozen=True)
+class ProtectOpts:
+    password: Optional[str] = None
+    allow_printing: bool = True
+    allow_copying: bool = True
+    allow_modification: bool = True
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "ProtectOpts":
+        return cls(
+            password=d.get('password'),
+            allow_printing=_convert_option_type(d.get('allow_printing'), bool, True),
+            allow_copying=_convert_option_type(d.get('allow_copying'), bool, True),
+            allow_modification=_convert_option_type(d.get('allow_modification'), bool, True),
+        )
+
+@dataclass(slots=True, frozen=True)
+class SplitOpts:
+    split_option: str = 'all'
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "SplitOpts":
+        return cls(split_option=d.get('split_option', 'all'))
+
+@dataclass(slots=True, frozen=True)
+class RotateOpts:
+    rotation_angle: int = 90
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "RotateOpts":
+        return cls(rotation_angle=_convert_option_type(d.get('rotation_angle'), int, 90))
+
+@dataclass(slots=True, frozen=True)
+class CompressOpts:
+    compression_quality: float = 0.5
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "CompressOpts":
+        return cls(compression_quality=_convert_option_type(d.get('compression_quality'), float, 0.5))
+
+@dataclass(slots=True, frozen=True)
+class ExcelOpts:
+    table_detection: str = 'auto'
+    excel_format: str = 'multi'
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "ExcelOpts":
+        return cls(table_detection=d.get('table_detection', 'auto'), excel_format=d.get('excel_format', 'multi'))
+
+@dataclass(slots=True, frozen=True)
+class PptOpts:
+    slide_width: float = 10.0
+    slide_height: float = 7.5
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "PptOpts":
+        return cls(
+            slide_width=_convert_option_type(d.get('slide_width'), float, 10.0),
+            slide_height=_convert_option_type(d.get('slide_height'), float, 7.5),
+        )
+
+@dataclass(slots=True, frozen=True)
+class JpgOpts:
+    dpi_resolution: int = ToolConfig.HIGH_QUALITY_DPI
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "JpgOpts":
+        return cls(dpi_resolution=_convert_option_type(d.get('dpi_resolution'), int, ToolConfig.HIGH_QUALITY_DPI))
+
+@dataclass(slots=True, frozen=True)
+class OcrOpts:
+    ocr_language: str = 'eng'
+    ocr_output: str = 'txt'
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "OcrOpts":
+        return cls(ocr_language=d.get('ocr_language', 'eng'), ocr_output=d.get('ocr_output', 'txt'))
+
+_TOOL_OPTION_PARSERS = {
+    "merge": MergeOpts,
+    "unlock": ProtectOpts,
+    "protect": ProtectOpts,
+    "split": SplitOpts,
+    "rotate": RotateOpts,
+    "compress": CompressOpts,
+    "pdf-to-excel": ExcelOpts,
+    "pdf-to-ppt": PptOpts,
+    "pdf-to-jpg": JpgOpts,
+    "ocr": OcrOpts,
+}
+
+# ------------------- Per-file Dispatch -------------------
+def _collect_output_paths(result: Any) -> List[str]:
+    """Extract output file paths from a tool result (dict, single path or list of paths)"""
+    output_paths = []
+    if isinstance(result, dict) and "output_files" in result:
+        for output_file in result["output_files"]:
+            if isinstance(output_file, dict) and "output_path" in output_file:
+                output_paths.append(output_file["output_path"])
+            elif isinstance(output_file, str):
+                output_paths.append(output_file)
+    elif isinstance(result, str):
+        output_paths.append(result)
+    elif isinstance(result, list):
+        output_paths.extend(result)
+    return output_paths
+
+def _run_per_file(process_one: Callable[[str], Any], file_paths: List[str]) -> List[str]:
+    """
+    Run process_one for every file, one after another, and return the output paths in
+    input order. The per-file tools all work through PyMuPDF, which is not thread-safe and
+    holds the GIL, so threads would add risk without overlap; the heavy per-page work
+    (rendering, OCR, splitting) already runs on the shared worker process pool.
+    """
+    return [path for file_path in file_paths for path in _collect_output_paths(process_one(file_path))]
+
 # ------------------- Execute Tool Function -------------------
 @rate_limited(30)  # Limit to 30 calls per minute
 def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[Dict] = None, 
@@ -334,8 +666,11 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
         'message': 'Tool execution failed'
     }
     
+    # Stat every file once; both size checks below reuse these values
+    file_sizes = get_file_sizes(file_paths)
+    
     # Validate total file size
-    is_valid_size, size_error = validate_total_file_size(file_paths, max_total_size_mb=10)
+    is_valid_size, size_error = validate_total_file_size(file_paths, max_total_size_mb=10, sizes=file_sizes)
     if not is_valid_size:
         return {
             'status': 'error',
@@ -360,13 +695,17 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
     
     # Validate individual file sizes
     for file_path in file_paths:
-        if not validate_file_size(file_path):
+        if not validate_file_size(file_path, size=file_sizes[file_path]):
             return {
                 'status': 'error',
                 'output_files': [],
                 'message': f"File {os.path.basename(file_path)} exceeds size limit"
             }
     
+    # Parse tool_options once into the tool's typed options (None for tools without any)
+    parser = _TOOL_OPTION_PARSERS.get(tool_id)
+    opts = parser.from_dict(tool_options or {}) if parser else None
+    
     processed_files = []
     try:
         # --- Merge tool requires 2+ files ---
@@ -379,19 +718,16 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
                 }
             
             # Extract file order from tool_options
-            file_order = tool_options.get('file_order', []) if tool_options else []
+            file_order = opts.file_order
             if file_order:
-                # Reorder files based on the specified order
-                ordered_files = []
-                for filename in file_order:
-                    for file_path in file_paths:
-                        if os.path.basename(file_path) == filename:
-                            ordered_files.append(file_path)
-                            break
-                # Add any files not in the order list
+                # Reorder files based on the specified order (first path wins on duplicate names)
+                by_name = {}
                 for file_path in file_paths:
-                    if file_path not in ordered_files:
-                        ordered_files.append(file_path)
+                    by_name.setdefault(os.path.basename(file_path), file_path)
+                ordered_files = [by_name[filename] for filename in file_order if filename in by_name]
+                # Add any files not in the order list
+                seen = set(ordered_files)
+                ordered_files.extend(file_path for file_path in file_paths if file_path not in seen)
                 file_paths = ordered_files
             
             result = tool_func(file_paths)
@@ -426,16 +762,16 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
                 }
             
             # Extract password from tool_options
-            tool_password = tool_options.get('password', password) if tool_options else password
+            tool_password = opts.password if opts.password is not None else password
             
             if tool_id == "unlock":
                 result = tool_func(file_paths[0], tool_password)
             elif tool_id == "protect":
                 # Extract permissions from tool_options
                 permissions_config = {
-                    'allow_printing': _convert_option_type(tool_options.get('allow_printing'), bool, True) if tool_options else True,
-                    'allow_copying': _convert_option_type(tool_options.get('allow_copying'), bool, True) if tool_options else True,
-                    'allow_modification': _convert_option_type(tool_options.get('allow_modification'), bool, True) if tool_options else True,
+                    'allow_printing': opts.allow_printing,
+                    'allow_copying': opts.allow_copying,
+                    'allow_modification': opts.allow_modification,
                 }
                 result = tool_func(file_paths[0], tool_password, permissions_config)
             
@@ -461,26 +797,19 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
 
         # --- Split tool ---
         elif tool_id == "split":
-            all_split_files = []
-            for file_path in file_paths:
+            def _process_one(file_path):
                 filename = os.path.basename(file_path)
                 pages = page_selections.get(filename, []) if page_selections else []
                 
                 # Pass tool_options directly to split_pdf
-                result = tool_func(file_path, pages, tool_options)
-                
-                if isinstance(result, dict) and "output_files" in result:
-                    # Extract actual file paths from the result dictionaries
-                    for output_file in result["output_files"]:
-                        if isinstance(output_file, dict) and "output_path" in output_file:
-                            all_split_files.append(output_file["output_path"])
-                        elif isinstance(output_file, str):
-                            all_split_files.append(output_file)
+                return tool_func(file_path, pages, tool_options)
+            
+            all_split_files = _run_per_file(_process_one, file_paths)
             
             # For split, if there's only one output file (e.g., splitting a single page), don't zip it.
             # If there are multiple output files, or if the split option explicitly requested a zip, then zip.
             if all_split_files:
-                split_option = tool_options.get('split_option', 'all') if tool_options else 'all'
+                split_option = opts.split_option
                 if len(all_split_files) > 1 or split_option == 'all': # 'all' implies zip for multiple pages
                     zip_file = create_zip_from_files(all_split_files, zip_prefix=f"split_{os.path.splitext(os.path.basename(file_paths[0]))[0]}")
                     return {
@@ -503,28 +832,21 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
 
         # --- Rotate tool ---
         elif tool_id == "rotate":
-            all_rotated_files = []
-            for file_path in file_paths:
+            def _process_one(file_path):
                 filename = os.path.basename(file_path)
                 pages = page_selections.get(filename, []) if page_selections else []
         
                 # Extract rotation options
-                rotation_angle = _convert_option_type(tool_options.get('rotation_angle'), int, 90) if tool_options else 90
+                rotation_angle = opts.rotation_angle
         
                 # Create a rotation angle for each selected page if pages are specified
                 rotation_angles_for_tool = None
                 if pages:
                     rotation_angles_for_tool = {str(p-1): rotation_angle for p in pages}
         
-                result = tool_func(file_path, pages=pages, rotation_angles=rotation_angles_for_tool)
-        
-                if isinstance(result, dict) and "output_files" in result:
-                    # Extract actual file paths from the result dictionaries
-                    for output_file in result["output_files"]:
-                        if isinstance(output_file, dict) and "output_path" in output_file:
-                            all_rotated_files.append(output_file["output_path"])
-                        elif isinstance(output_file, str):
-                            all_rotated_files.append(output_file)
+                return tool_func(file_path, pages=pages, rotation_angles=rotation_angles_for_tool)
+            
+            all_rotated_files = _run_per_file(_process_one, file_paths)
     
             if all_rotated_files:
                 # If multiple input files, or multiple output files from a single input (e.g., split and rotate), then zip.
@@ -551,23 +873,16 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
     
         # --- Compress tool ---
         elif tool_id == "compress":
-            all_compressed_files = []
-            for file_path in file_paths:
+            def _process_one(file_path):
                 filename = os.path.basename(file_path)
                 pages = page_selections.get(filename, []) if page_selections else []
                 
                 # Extract compression quality
-                compression_quality = _convert_option_type(tool_options.get('compression_quality'), float, 0.5) if tool_options else 0.5
-                
-                result = tool_func(file_path, pages, compression_quality)
+                compression_quality = opts.compression_quality
                 
-                if isinstance(result, dict) and "output_files" in result:
-                    # Extract actual file paths from the result dictionaries
-                    for output_file in result["output_files"]:
-                        if isinstance(output_file, dict) and "output_path" in output_file:
-                            all_compressed_files.append(output_file["output_path"])
-                        elif isinstance(output_file, str):
-                            all_compressed_files.append(output_file)
+                return tool_func(file_path, pages, compression_quality)
+            
+            all_compressed_files = _run_per_file(_process_one, file_paths)
             
             if all_compressed_files:
                 if len(file_paths) > 1 or len(all_compressed_files) > 1:
@@ -592,20 +907,13 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
 
         # --- PDF to Word tool ---
         elif tool_id == "pdf-to-word":
-            all_converted_files = []
-            for file_path in file_paths:
+            def _process_one(file_path):
                 filename = os.path.basename(file_path)
                 pages = page_selections.get(filename, []) if page_selections else []
                 
-                result = tool_func(file_path, pages)
-                
-                if isinstance(result, dict) and "output_files" in result:
-                    # Extract actual file paths from the result dictionaries
-                    for output_file in result["output_files"]:
-                        if isinstance(output_file, dict) and "output_path" in output_file:
-                            all_converted_files.append(output_file["output_path"])
-                        elif isinstance(output_file, str):
-                            all_converted_files.append(output_file)
+                return tool_func(file_path, pages)
+            
+            all_converted_files = _run_per_file(_process_one, file_paths)
             
             if all_converted_files:
                 if len(file_paths) > 1 or len(all_converted_files) > 1:
@@ -630,24 +938,17 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
 
         # --- PDF to Excel tool ---
         elif tool_id == "pdf-to-excel":
-            all_converted_files = []
-            for file_path in file_paths:
+            def _process_one(file_path):
                 filename = os.path.basename(file_path)
                 pages = page_selections.get(filename, []) if page_selections else []
                 
                 # Extract conversion options
-                table_detection = tool_options.get('table_detection', 'auto') if tool_options else 'auto'
-                excel_format = tool_options.get('excel_format', 'multi') if tool_options else 'multi'
-                
-                result = tool_func(file_path, pages, table_detection, excel_format)
+                table_detection = opts.table_detection
+                excel_format = opts.excel_format
                 
-                if isinstance(result, dict) and "output_files" in result:
-                    # Extract actual file paths from the result dictionaries
-                    for output_file in result["output_files"]:
-                        if isinstance(output_file, dict) and "output_path" in output_file:
-                            all_converted_files.append(output_file["output_path"])
-                        elif isinstance(output_file, str):
-                            all_converted_files.append(output_file)
+                return tool_func(file_path, pages, table_detection, excel_format)
+            
+            all_converted_files = _run_per_file(_process_one, file_paths)
             
             if all_converted_files:
                 if len(file_paths) > 1 or len(all_converted_files) > 1:
@@ -672,24 +973,17 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
 
         # --- PDF to PowerPoint tool ---
         elif tool_id == "pdf-to-ppt":
-            all_converted_files = []
-            for file_path in file_paths:
+            def _process_one(file_path):
                 filename = os.path.basename(file_path)
                 pages = page_selections.get(filename, []) if page_selections else []
                 
                 # Extract conversion options
-                slide_width = _convert_option_type(tool_options.get('slide_width'), float, 10.0) if tool_options else 10.0
-                slide_height = _convert_option_type(tool_options.get('slide_height'), float, 7.5) if tool_options else 7.5
-                
-                result = tool_func(file_path, pages, slide_width, slide_height)
+                slide_width = opts.slide_width
+                slide_height = opts.slide_height
                 
-                if isinstance(result, dict) and "output_files" in result:
-                    # Extract actual file paths from the result dictionaries
-                    for output_file in result["output_files"]:
-                        if isinstance(output_file, dict) and "output_path" in output_file:
-                            all_converted_files.append(output_file["output_path"])
-                        elif isinstance(output_file, str):
-                            all_converted_files.append(output_file)
+                return tool_func(file_path, pages, slide_width, slide_height)
+            
+            all_converted_files = _run_per_file(_process_one, file_paths)
             
             if all_converted_files:
                 if len(file_paths) > 1 or len(all_converted_files) > 1:
@@ -714,23 +1008,16 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
 
         # --- PDF to JPG tool ---
         elif tool_id == "pdf-to-jpg":
-            all_converted_files = []
-            for file_path in file_paths:
+            def _process_one(file_path):
                 filename = os.path.basename(file_path)
                 pages = page_selections.get(filename, []) if page_selections else []
                 
                 # Extract conversion options
-                dpi_resolution = _convert_option_type(tool_options.get('dpi_resolution'), int, ToolConfig.HIGH_QUALITY_DPI) if tool_options else ToolConfig.HIGH_QUALITY_DPI
+                dpi_resolution = opts.dpi_resolution
                 
-                result = tool_func(file_path, pages, dpi_resolution)
-                
-                if isinstance(result, dict) and "output_files" in result:
-                    # Extract actual file paths from the result dictionaries
-                    for output_file in result["output_files"]:
-                        if isinstance(output_file, dict) and "output_path" in output_file:
-                            all_converted_files.append(output_file["output_path"])
-                        elif isinstance(output_file, str):
-                            all_converted_files.append(output_file)
+                return tool_func(file_path, pages, dpi_resolution)
+            
+            all_converted_files = _run_per_file(_process_one, file_paths)
             
             if all_converted_files:
                 # PDF to JPG always produces multiple JPGs (one per page), so it should always be zipped.
@@ -749,20 +1036,13 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
 
         # --- PDF to Text tool ---
         elif tool_id == "pdf-to-text":
-            all_converted_files = []
-            for file_path in file_paths:
+            def _process_one(file_path):
                 filename = os.path.basename(file_path)
                 pages = page_selections.get(filename, []) if page_selections else []
                 
-                result = tool_func(file_path, pages)
-                
-                if isinstance(result, dict) and "output_files" in result:
-                    # Extract actual file paths from the result dictionaries
-                    for output_file in result["output_files"]:
-                        if isinstance(output_file, dict) and "output_path" in output_file:
-                            all_converted_files.append(output_file["output_path"])
-                        elif isinstance(output_file, str):
-                            all_converted_files.append(output_file)
+                return tool_func(file_path, pages)
+            
+            all_converted_files = _run_per_file(_process_one, file_paths)
             
             if all_converted_files:
                 if len(file_paths) > 1 or len(all_converted_files) > 1:
@@ -787,24 +1067,17 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
 
         # --- OCR tool ---
         elif tool_id == "ocr":
-            all_converted_files = []
-            for file_path in file_paths:
+            def _process_one(file_path):
                 filename = os.path.basename(file_path)
                 pages = page_selections.get(filename, []) if page_selections else []
                 
                 # Extract conversion options
-                ocr_language = tool_options.get('ocr_language', 'eng') if tool_options else 'eng'
-                ocr_output = tool_options.get('ocr_output', 'txt') if tool_options else 'txt'
-                
-                result = tool_func(file_path, pages, ocr_language, ocr_output)
+                ocr_language = opts.ocr_language
+                ocr_output = opts.ocr_output
                 
-                if isinstance(result, dict) and "output_files" in result:
-                    # Extract actual file paths from the result dictionaries
-                    for output_file in result["output_files"]:
-                        if isinstance(output_file, dict) and "output_path" in output_file:
-                            all_converted_files.append(output_file["output_path"])
-                        elif isinstance(output_file, str):
-                            all_converted_files.append(output_file)
+                return tool_func(file_path, pages, ocr_language, ocr_output)
+            
+            all_converted_files = _run_per_file(_process_one, file_paths)
             
             if all_converted_files:
                 if len(file_paths) > 1 or len(all_converted_files) > 1:
@@ -829,41 +1102,32 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
 
         # --- Default case for other tools (e.g., single PDF input, single PDF output) ---
         else:
-            # Process each file individually
-            for file_path in file_paths:
-                filename = os.path.basename(file_path)
-                pages = page_selections.get(filename, []) if page_selections else []
-                
-                # Validate page selections
-                max_pages = get_pdf_page_count(file_path)
-                if pages and not validate_page_selections({filename: pages}, max_pages):
-                    return {
-                        "status": "error",
-                        "output_files": [],
-                        "message": f"Invalid page selection for {filename}"
-                    }
-                
+            # Validate all page selections up front; only files with a selection need a page count
+            file_pages = {
+                file_path: (page_selections or {}).get(os.path.basename(file_path), [])
+                for file_path in file_paths
+            }
+            selected = {os.path.basename(fp): pages for fp, pages in file_pages.items() if pages}
+            page_counts = {os.path.basename(fp): get_pdf_page_count(fp) for fp, pages in file_pages.items() if pages}
+            invalid = _validate_batch(selected, page_counts)
+            if invalid:
+                return {
+                    "status": "error",
+                    "output_files": [],
+                    "message": f"Invalid page selection for {', '.join(sorted(invalid))}"
+                }
+            
+            def _process_one(file_path):
                 try:
                     # Call the tool function with pages if specified
                     # For tools like compress, rotate, etc., the tool_func itself should handle pages
-                    res = tool_func(file_path, pages=pages, **tool_options) # Pass all tool_options
-                    
-                    if isinstance(res, dict) and "output_files" in res:
-                        # Extract actual file paths from the result dictionaries
-                        for output_file in res["output_files"]:
-                            if isinstance(output_file, dict) and "output_path" in output_file:
-                                processed_files.append(output_file["output_path"])
-                            elif isinstance(output_file, str):
-                                processed_files.append(output_file)
-                    elif isinstance(res, str):
-                        processed_files.append(res)
-                    elif isinstance(res, list):
-                        processed_files.extend(res)
-                        
+                    return tool_func(file_path, pages=file_pages[file_path], **(tool_options or {})) # Pass all tool_options
                 except Exception as e:
                     logger.error(f"Error processing {file_path} with tool {tool_id}: {e}")
                     # Continue processing other files
-                    continue
+                    return None
+            
+            processed_files = _run_per_file(_process_one, file_paths)
             
             if processed_files:
                 # If multiple input files, or multiple output files from a single input, then zip.
@@ -923,41 +1187,84 @@ def execute_tool(tool_id: str, file_paths: List[str], page_selections: Optional[
     finally:
         # Only clean up files that are in the UPLOAD_FOLDER
         upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-        upload_folder_abs = os.path.abspath(upload_folder)
+        # Separator-suffixed so "uploads2/" doesn't match "uploads/"
+        upload_prefix = os.path.realpath(upload_folder) + os.sep
         
+        # Uploads share a few session folders, so resolve each parent directory once
+        dir_in_uploads = {}
         files_to_cleanup = []
         for file_path in file_paths:
-            file_path_abs = os.path.abspath(file_path)
-            if file_path_abs.startswith(upload_folder_abs):
+            parent = os.path.dirname(file_path)
+            inside = dir_in_uploads.get(parent)
+            if inside is None:
+                inside = dir_in_uploads[parent] = (os.path.realpath(parent) + os.sep).startswith(upload_prefix)
+            if inside:
                 files_to_cleanup.append(file_path)
         
+        # Page-count and password caches are left alone: their keys include the file's
+        # mtime, so entries for removed uploads can't be hit and age out of the LRU
         cleanup_temp_files(files_to_cleanup)
 
 # ------------------- Helper Functions -------------------
+# (abspath, mtime_ns, size, password digest) -> result; the password itself is never stored
+_PASSWORD_CHECKS: "OrderedDict[Tuple[str, int, int, bytes], bool]" = OrderedDict()
+_PASSWORD_CHECKS_LOCK = threading.Lock()
+
 def validate_pdf_password(pdf_path: str, password: str) -> bool:
-    """Validate PDF password"""
+    """Validate PDF password, caching the result per file version and password"""
     try:
+        st = os.stat(pdf_path)
+        key = (os.path.abspath(pdf_path), st.st_mtime_ns, st.st_size,
+               hashlib.blake2b((password or '').encode('utf-8'), digest_size=16).digest())
+        with _PASSWORD_CHECKS_LOCK:
+            if key in _PASSWORD_CHECKS:
+                _PASSWORD_CHECKS.move_to_end(key)
+                return _PASSWORD_CHECKS[key]
+
         with open(pdf_path, "rb") as f:
             reader = PdfReader(f)
             if reader.is_encrypted:
-                result = reader.decrypt(password)
-                return result == 1
+                result = reader.decrypt(password) == 1
             else:
-                return True
+                result = True
+
+        with _PASSWORD_CHECKS_LOCK:
+            _PASSWORD_CHECKS[key] = result
+            while len(_PASSWORD_CHECKS) > ToolConfig.PDF_INFO_CACHE_MAXSIZE:
+                _PASSWORD_CHECKS.popitem(last=False)
+        return result
     except Exception:
         return False
 
+# Lower-cased once at import so allowed_file only lowers the candidate extension
+_ALLOWED_EXT_SET = frozenset(ext.lower() for ext in ToolConfig.ALLOWED_EXTENSIONS)
+
 def allowed_file(filename: str) -> bool:
     """Check if file extension is allowed"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ToolConfig.ALLOWED_EXTENSIONS
+    _, dot, ext = filename.rpartition('.')
+    return bool(dot) and ext.lower() in _ALLOWED_EXT_SET
 
 # ------------------- Health Check -------------------
+# (monotonic sample time, memory %, disk %); refreshed at most once per HEALTH_SAMPLE_INTERVAL
+_HEALTH_SAMPLE: Optional[Tuple[float, float, float]] = None
+_HEALTH_SAMPLE_LOCK = threading.Lock()
+
+def _sample_system_usage() -> Tuple[float, float]:
+    """Memory and disk usage percentages, cached so frequent probes don't hit psutil each time"""
+    global _HEALTH_SAMPLE
+    now = time.monotonic()
+    with _HEALTH_SAMPLE_LOCK:
+        if _HEALTH_SAMPLE is None or now - _HEALTH_SAMPLE[0] >= ToolConfig.HEALTH_SAMPLE_INTERVAL:
+            import psutil
+            _HEALTH_SAMPLE = (now, psutil.virtual_memory().percent, psutil.disk_usage('/').percent)
+        return _HEALTH_SAMPLE[1], _HEALTH_SAMPLE[2]
+
 def health_check() -> Dict[str, Any]:
     """System health check"""
-    import psutil
+    memory_usage, disk_usage = _sample_system_usage()
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "memory_usage": psutil.virtual_memory().percent,
-        "disk_usage": psutil.disk_usage('/').percent
+        "memory_usage": memory_usage,
+        "disk_usage": disk_usage
     }
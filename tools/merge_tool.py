@@ -8,6 +8,9 @@ from utils.file_naming_utils import generate_file_names
 
 logger = logging.getLogger(__name__)
 
+# PdfMerger writes object by object; a large buffer coalesces those into few syscalls
+MERGE_WRITE_BUFFER_SIZE = 1 << 20
+
 def merge_pdfs(file_paths):
     """
     Merge multiple PDF files into one.
@@ -38,8 +41,11 @@ def merge_pdfs(file_paths):
         for file_path in file_paths:
             merger.append(file_path)
 
-        merger.write(out_path)
-        merger.close()
+        try:
+            with open(out_path, "wb", buffering=MERGE_WRITE_BUFFER_SIZE) as f_out:
+                merger.write(f_out)
+        finally:
+            merger.close()
 
         logger.info(f"Merged {len(file_paths)} PDFs into {out_path}")
         return {
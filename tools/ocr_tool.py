@@ -1,6 +1,9 @@
 # tools/ocr_tool.py
 import os
 import logging
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Union
 from flask import current_app
 import fitz  # PyMuPDF
 import pytesseract
@@ -8,9 +11,54 @@ from PIL import Image
 from utils.file_utils import validate_file_size
 from utils.file_manager import get_session_folder
 from utils.file_naming_utils import generate_file_names
+from utils.worker_pool import WORKER_POOL_SIZE, get_worker_pool, discard_worker_pool
 
 logger = logging.getLogger(__name__)
 
+# ------------------- OCR Workers -------------------
+# Pages are rendered and recognised on the shared worker process pool (utils.worker_pool),
+# so pages of one file are recognised on several cores at once. Only plain arguments cross
+# the process boundary, since the Flask request context is not available in workers.
+
+def _ocr_page(pdf_path: str, page_num: int, language: str, output_type: str) -> Union[str, bytes]:
+    """Render one page and OCR it: text for 'txt', a one-page PDF (bytes) for 'pdf'"""
+    doc = fitz.open(pdf_path)
+    try:
+        pix = doc.load_page(page_num).get_pixmap()
+        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    finally:
+        doc.close()
+    if output_type == 'txt':
+        return pytesseract.image_to_string(img, lang=language)
+    return pytesseract.image_to_pdf_or_hocr(img, lang=language, extension='pdf')
+
+def _iter_ocr_pages(pdf_path: str, page_nums: List[int], language: str,
+                    output_type: str) -> Iterator[Union[str, bytes]]:
+    """
+    Yield OCR results in page order. Only a window of WORKER_POOL_SIZE pages is queued on
+    the shared pool at a time, so a long file doesn't starve other requests and finished
+    pages are consumed before more are submitted. Falls back to in-process if the pool breaks.
+    """
+    pool = get_worker_pool()
+    pending = deque()
+    done = 0
+    try:
+        for page_num in page_nums:
+            pending.append(pool.submit(_ocr_page, pdf_path, page_num, language, output_type))
+            if len(pending) >= WORKER_POOL_SIZE:
+                result = pending.popleft().result()
+                done += 1
+                yield result
+        while pending:
+            result = pending.popleft().result()
+            done += 1
+            yield result
+    except BrokenProcessPool:
+        logger.warning("OCR worker pool broke; recognising remaining pages in-process")
+        discard_worker_pool(pool)
+        for page_num in page_nums[done:]:
+            yield _ocr_page(pdf_path, page_num, language, output_type)
+
 def ocr_pdf(file_path, pages=None, language='eng', output_type='txt'):
     """
     Perform OCR on PDF pages and output text or searchable PDF.
@@ -70,11 +118,8 @@ def ocr_pdf(file_path, pages=None, language='eng', output_type='txt'):
 
         if output_type == 'txt':
             text_output = ""
-            for page_num in pages_to_process:
-                page = doc.load_page(page_num)
-                pix = page.get_pixmap()
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                text = pytesseract.image_to_string(img, lang=language)
+            texts = _iter_ocr_pages(file_path, pages_to_process, language, output_type)
+            for page_num, text in zip(pages_to_process, texts):
                 text_output += f"--- Page {page_num + 1} ---\n{text}\n\n"
 
             with open(out_path, "w", encoding="utf-8") as f:
@@ -95,11 +140,7 @@ def ocr_pdf(file_path, pages=None, language='eng', output_type='txt'):
         elif output_type == 'pdf':
             # Create a new PDF with OCR text layer
             new_doc = fitz.open()
-            for page_num in pages_to_process:
-                page = doc.load_page(page_num)
-                pix = page.get_pixmap()
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                text = pytesseract.image_to_pdf_or_hocr(img, lang=language, extension='pdf')
+            for text in _iter_ocr_pages(file_path, pages_to_process, language, output_type):
                 # Insert OCR page as PDF page
                 ocr_page = fitz.open("pdf", text)
                 new_doc.insert_pdf(ocr_page)
@@ -2,10 +2,12 @@
 import os
 import logging
 from flask import current_app
-from pdf2docx import Converter
-from docx import Document
+import fitz  # PyMuPDF
 import openpyxl
-from openpyxl.styles import Font, Alignment, Border, Side
+from lxml import etree
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, Border, Side, NamedStyle
+from openpyxl.utils import get_column_letter
 from utils.file_utils import validate_file_size
 from utils.file_manager import get_session_folder
 from utils.file_naming_utils import generate_file_names
@@ -13,6 +15,116 @@ from utils.file_naming_utils import generate_file_names
 # Set up logger
 logger = logging.getLogger(__name__)
 
+# PyMuPDF >= 1.23 detects tables natively; older versions fall back to the PDF → Word route
+_HAS_FIND_TABLES = hasattr(fitz.Page, 'find_tables')
+
+# Precompiled WordprocessingML queries for the pdf2docx fallback
+W_NS = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
+_TR = etree.XPath('.//w:tr', namespaces=W_NS)
+_TC = etree.XPath('.//w:tc', namespaces=W_NS)
+_T = etree.XPath('.//w:t', namespaces=W_NS)
+
+_THIN_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'),
+                      top=Side(style='thin'), bottom=Side(style='thin'))
+_HEADER_FONT = Font(bold=True)
+_CENTER_ALIGN = Alignment(horizontal="center", vertical="center", wrap_text=True)
+_LEFT_ALIGN = Alignment(horizontal="left", vertical="center", wrap_text=True)
+
+def _named_styles():
+    """Fresh named styles for one workbook (NamedStyle binds to the workbook it is added to)"""
+    return [
+        NamedStyle(name='pdf_text', alignment=_LEFT_ALIGN),
+        NamedStyle(name='pdf_table_title', font=_HEADER_FONT, alignment=_CENTER_ALIGN),
+        NamedStyle(name='pdf_table_header', font=_HEADER_FONT, border=_THIN_BORDER, alignment=_CENTER_ALIGN),
+        NamedStyle(name='pdf_table_cell', border=_THIN_BORDER, alignment=_CENTER_ALIGN),
+    ]
+
+def _add_row(rows, widths, values, style):
+    """Queue a row for a sheet and update that sheet's longest text per 1-based column"""
+    rows.append((values, style))
+    for col, value in enumerate(values, start=1):
+        if value and len(value) > widths.get(col, 0):
+            widths[col] = len(value)
+
+def _clean_text(text):
+    """Collapse whitespace (including line breaks inside a cell or block) to single spaces"""
+    return " ".join(text.split()) if text else ""
+
+def _iter_pdf_blocks(file_path, pages=None):
+    """
+    Yield ('text', str) and ('table', rows) blocks straight from the PDF, page by page
+    in top-to-bottom order. Text that lies inside a detected table is not repeated.
+    """
+    doc = fitz.open(file_path)
+    try:
+        if pages:
+            page_numbers = [p-1 for p in pages if 1 <= p <= len(doc)]
+        else:
+            page_numbers = range(len(doc))
+
+        for page_num in page_numbers:
+            page = doc[page_num]
+            tables = page.find_tables().tables
+            table_rects = [fitz.Rect(table.bbox) for table in tables]
+
+            items = [
+                (table.bbox[1], 'table', [[_clean_text(cell) for cell in row] for row in table.extract()])
+                for table in tables
+            ]
+            for x0, y0, x1, y1, text, _, block_type in page.get_text("blocks"):
+                if block_type != 0 or not text.strip():
+                    continue  # Image block or empty text
+                if any(fitz.Rect(x0, y0, x1, y1).intersects(rect) for rect in table_rects):
+                    continue  # Already exported as part of a table
+                items.append((y0, 'text', _clean_text(text)))
+
+            items.sort(key=lambda item: item[0])
+            for _, kind, value in items:
+                yield kind, value
+    finally:
+        doc.close()
+
+def _iter_docx_blocks(file_path, pages, temp_word_path):
+    """
+    Fallback for PyMuPDF without find_tables: convert PDF → Word with pdf2docx and
+    yield the same ('text', str) / ('table', rows) blocks from the document body.
+    """
+    from pdf2docx import Converter
+    from docx import Document
+
+    try:
+        # Convert PDF to Word with optional page selection
+        cv = Converter(file_path)
+        if pages:
+            # Convert specific pages only
+            # pdf2docx uses 0-based indexing for start and end
+            start_page_0_based = min(pages) - 1
+            end_page_0_based = max(pages) - 1
+            cv.convert(temp_word_path, start=start_page_0_based, end=end_page_0_based)
+        else:
+            cv.convert(temp_word_path, start=0, end=None)
+        cv.close()
+
+        doc = Document(temp_word_path)
+        for block in doc.element.body:
+            if block.tag.endswith('p'):  # Paragraphs → main sheet
+                text = ''.join([t.text for t in _T(block) if t.text])
+                if text.strip():
+                    yield 'text', text.strip()
+
+            elif block.tag.endswith('tbl'):  # Tables
+                rows = []
+                for row in _TR(block):
+                    rows.append([
+                        " ".join(t.text for t in _T(cell) if t.text).strip()
+                        for cell in _TC(row)
+                    ])
+                yield 'table', rows
+    finally:
+        # Cleanup temp Word file
+        if os.path.exists(temp_word_path):
+            os.remove(temp_word_path)
+
 def pdf_to_excel(file_path, pages=None, table_detection="auto", excel_format="multi"):
     """Convert PDF → Excel preserving text and tables - compatible with generic_tools.py"""
     try:
@@ -36,112 +148,69 @@ def pdf_to_excel(file_path, pages=None, table_detection="auto", excel_format="mu
         processed_folder = get_session_folder('processed')
         out_path = os.path.join(processed_folder, stored_name)
         
-        # Get session-specific upload folder for temp files
-        upload_folder = get_session_folder('uploads')
-        
         # Ensure directories exist
         os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        os.makedirs(upload_folder, exist_ok=True)
 
-        # Step 1: PDF → Word (temp)
-        temp_word_path = os.path.join(upload_folder, f"temp_excel_{stored_name}.docx")
-        
-        # Convert PDF to Word with optional page selection
-        cv = Converter(file_path)
-        if pages:
-            # Convert specific pages only
-            # pdf2docx uses 0-based indexing for start and end
-            start_page_0_based = min(pages) - 1
-            end_page_0_based = max(pages) - 1
-            cv.convert(temp_word_path, start=start_page_0_based, end=end_page_0_based)
+        # Step 1: PDF → text and table blocks
+        if _HAS_FIND_TABLES:
+            blocks = _iter_pdf_blocks(file_path, pages)
         else:
-            cv.convert(temp_word_path, start=0, end=None)
-        cv.close()
-
-        # Step 2: Word → Excel
-        doc = Document(temp_word_path)
-        wb = openpyxl.Workbook()
-        ws_main = wb.active
-        ws_main.title = "PDF Data"
-
-        thin_border = Border(left=Side(style='thin'), right=Side(style='thin'),
-                             top=Side(style='thin'), bottom=Side(style='thin'))
-        header_font = Font(bold=True)
-        center_align = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        left_align = Alignment(horizontal="left", vertical="center", wrap_text=True)
-
-        row_idx = 1
+            # Temp Word file goes in the session-specific upload folder
+            upload_folder = get_session_folder('uploads')
+            os.makedirs(upload_folder, exist_ok=True)
+            blocks = _iter_docx_blocks(file_path, pages, os.path.join(upload_folder, f"temp_excel_{stored_name}.docx"))
+
+        # Step 2: group rows per sheet; write-only sheets need their column widths before the first row
+        # Column widths are tracked while rows are queued, so no second pass over the cells is needed
+        main_sheet = ("PDF Data", [], {})
+        table_sheets = []  # [(title, [(values, style_name), ...], {column: max_len})]
         table_count = 0
-        table_sheet = None
 
-        for block in doc.element.body:
-            if block.tag.endswith('p'):  # Paragraphs → main sheet
-                para = block.xpath('.//w:t')
-                text = ''.join([t.text for t in para if t.text])
-                if text.strip():
-                    ws_main.cell(row=row_idx, column=1, value=text.strip())
-                    ws_main.cell(row=row_idx, column=1).alignment = left_align
-                    row_idx += 1
+        for kind, value in blocks:
+            if kind == 'text':  # Paragraphs → main sheet
+                _add_row(main_sheet[1], main_sheet[2], [value], 'pdf_text')
 
-            elif block.tag.endswith('tbl'):  # Tables
+            elif kind == 'table':  # Tables
                 table_count += 1
                 if excel_format == "multi":
-                    ws_table = wb.create_sheet(title=f"Table_{table_count}")
+                    sheet = (f"Table_{table_count}", [], {})
+                    table_sheets.append(sheet)
                 else: # single sheet
-                    if table_sheet is None:
-                        table_sheet = wb.create_sheet(title="All Tables")
-                        # Add a header for each table if it's the first table in single mode
-                        ws_table.cell(row=ws_table.max_row + 1, column=1, value=f"--- Table {table_count} ---").font = header_font
-                        ws_table.cell(row=ws_table.max_row, column=1).alignment = center_align
-                    ws_table = table_sheet
-
-                start_row = 1 if excel_format == "multi" else ws_table.max_row + 1
-
-                for r, row in enumerate(block.findall('.//w:tr', namespaces=block.nsmap), start=start_row):
-                    for c, cell in enumerate(row.findall('.//w:tc', namespaces=row.nsmap), start=1):
-                        texts = [t.text for t in cell.findall('.//w:t', namespaces=cell.nsmap) if t.text]
-                        cell_text = " ".join(texts).strip()
-                        ws_table.cell(row=r, column=c, value=cell_text)
-                        ws_table.cell(row=r, column=c).border = thin_border
-                        ws_table.cell(row=r, column=c).alignment = center_align
-                        if r == start_row: # Apply header font only to the first row of each table
-                            ws_table.cell(row=r, column=c).font = header_font
-
-                # Auto column width
-                for col in ws_table.columns:
-                    max_len = 0
-                    col_letter = col[0].column_letter
-                    for cell in col:
-                        try:
-                            if cell.value and len(str(cell.value)) > max_len:
-                                max_len = len(str(cell.value))
-                        except:
-                            pass
-                    ws_table.column_dimensions[col_letter].width = max_len + 2
-                
+                    if not table_sheets:
+                        table_sheets.append(("All Tables", [], {}))
+                    sheet = table_sheets[0]
+                    # Add a header line before each table in single sheet mode
+                    _add_row(sheet[1], sheet[2], [f"--- Table {table_count} ---"], 'pdf_table_title')
+
+                for i, row in enumerate(value):
+                    # Apply header font only to the first row of each table
+                    _add_row(sheet[1], sheet[2], row, 'pdf_table_header' if i == 0 else 'pdf_table_cell')
+
                 if excel_format == "single":
                     # Add a blank row after each table in single sheet mode for separation
-                    ws_table.cell(row=ws_table.max_row + 1, column=1, value="").border = None
-
-        # Main sheet column width
-        for col in ws_main.columns:
-            max_len = 0
-            col_letter = col[0].column_letter
-            for cell in col:
-                try:
-                    if cell.value and len(str(cell.value)) > max_len:
-                        max_len = len(str(cell.value))
-                except:
-                    pass
-            ws_main.column_dimensions[col_letter].width = max_len + 2
+                    sheet[1].append(([], None))
+
+        # Step 3: stream rows into a write-only workbook
+        wb = openpyxl.Workbook(write_only=True)
+        for style in _named_styles():
+            wb.add_named_style(style)
+
+        for title, rows, widths in [main_sheet] + table_sheets:
+            ws = wb.create_sheet(title=title)
+            for col, width in widths.items():
+                ws.column_dimensions[get_column_letter(col)].width = width + 2
+
+            for values, style in rows:
+                row_cells = []
+                for cell_text in values:
+                    cell = WriteOnlyCell(ws, value=cell_text)
+                    cell.style = style
+                    row_cells.append(cell)
+                ws.append(row_cells)
 
         # Save Excel
         wb.save(out_path)
 
-        # Cleanup temp Word file
-        if os.path.exists(temp_word_path):
-            os.remove(temp_word_path)
-
         logger.info(f"Successfully converted {file_path} to Excel: {out_path}")
         
         return {
@@ -156,12 +225,6 @@ def pdf_to_excel(file_path, pages=None, table_detection="auto", excel_format="mu
 
     except Exception as e:
         logger.error(f"PDF to Excel conversion failed for {file_path}: {str(e)}")
-        
-        # Cleanup temp files on error
-        temp_word_path = os.path.join(get_session_folder('uploads'), f"temp_excel_{os.path.basename(file_path)}.docx")
-        if os.path.exists(temp_word_path):
-            os.remove(temp_word_path)
-            
         return {
             'status': 'error',
             'output_files': [],
@@ -1,9 +1,7 @@
 # tools/pdf_to_jpg_tool.py
 import os
-import zipfile
 import logging
 import re
-import shutil 
 import fitz  # PyMuPDF
 from flask import current_app
 from PIL import Image
@@ -13,7 +11,7 @@ from utils.file_manager import get_session_folder, get_session_previews_folder
 from utils.file_naming_utils import generate_file_names
 
 # Import from generic_tools for preview generation and high quality image generation
-from tools.generic_tools import generate_preview_thumbnails, generate_high_quality_images, PLACEHOLDER_FILENAME
+from tools.generic_tools import generate_preview_thumbnails, iter_high_quality_images, create_zip_from_buffers, PLACEHOLDER_FILENAME
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -39,12 +37,10 @@ def pdf_to_jpg(file_path, pages=None, dpi=300, generate_previews=True):
 
         # Get session-specific folders
         processed_folder = get_session_folder('processed')
-        upload_folder = get_session_folder('uploads')
         out_path = os.path.join(processed_folder, stored_name)
         
         # Ensure directories exist
         os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        os.makedirs(upload_folder, exist_ok=True)
 
         # Generate preview thumbnails using the existing function from generic_tools
         preview_files = []
@@ -60,38 +56,27 @@ def pdf_to_jpg(file_path, pages=None, dpi=300, generate_previews=True):
                 logger.warning(f"Preview generation failed: {str(e)}")
                 preview_files = []
 
-        # Generate high quality images using the new function
-        temp_image_dir = os.path.join(upload_folder, f"temp_jpg_{stored_name}")
-        os.makedirs(temp_image_dir, exist_ok=True)
+        # Render pages one at a time and stream each JPEG straight into the ZIP
+        image_count = 0
+        def _counted(image_buffers):
+            nonlocal image_count
+            for item in image_buffers:
+                image_count += 1
+                yield item
         
-        # Convert pages to high quality images
-        image_files = generate_high_quality_images(
-            file_path, 
-            temp_image_dir, 
-            pages=pages, 
-            dpi=dpi, 
-            quality=95
+        create_zip_from_buffers(
+            _counted(iter_high_quality_images(file_path, pages=pages, dpi=dpi, quality=95)),
+            zip_path=out_path
         )
 
-        if not image_files:
+        if not image_count:
+            os.remove(out_path)
             return {
                 'status': 'error',
                 'output_files': [],
                 'message': "No pages found for conversion or conversion failed"
             }
 
-        # Create ZIP file with high quality images
-        with zipfile.ZipFile(out_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for img_path in image_files:
-                zipf.write(img_path, os.path.basename(img_path))
-
-        # Cleanup temporary images
-        for img_path in image_files:
-            if os.path.exists(img_path):
-                os.remove(img_path)
-        if os.path.exists(temp_image_dir):
-            shutil.rmtree(temp_image_dir)
-
         logger.info(f"Successfully converted {file_path} to high quality JPG images: {out_path}")
         
         # Prepare response
@@ -102,7 +87,7 @@ def pdf_to_jpg(file_path, pages=None, dpi=300, generate_previews=True):
                 'stored_name': stored_name,
                 'output_path': out_path
             }],
-            'message': f'PDF converted to {len(image_files)} high quality JPG images. DPI: {dpi}'
+            'message': f'PDF converted to {image_count} high quality JPG images. DPI: {dpi}'
         }
         
         # Add previews to response if generated
@@ -119,13 +104,6 @@ def pdf_to_jpg(file_path, pages=None, dpi=300, generate_previews=True):
     except Exception as e:
         logger.error(f"PDF to JPG conversion failed for {file_path}: {str(e)}")
         
-        # Cleanup on error
-        temp_image_dir = os.path.join(get_session_folder('uploads'), f"temp_jpg_{os.path.basename(file_path)}")
-        if os.path.exists(temp_image_dir):
-            for file in os.listdir(temp_image_dir):
-                os.remove(os.path.join(temp_image_dir, file))
-            shutil.rmtree(temp_image_dir)
-            
         return {
             'status': 'error',
             'output_files': [],
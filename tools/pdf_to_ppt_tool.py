@@ -1,7 +1,8 @@
 # tools/pdf_to_ppt_tool.py
 import os
-import time
+import shutil
 import logging
+import tempfile
 from flask import current_app
 from pdf2image import convert_from_path
 from pptx import Presentation
@@ -18,6 +19,7 @@ def pdf_to_ppt(file_path, pages=None, slide_width=10.0, slide_height=7.5):
     pages: list of 1-based page numbers to convert (optional)
     slide_width, slide_height: slide dimensions in inches
     """
+    temp_dir = None
     try:
         if not validate_file_size(file_path):
             return {
@@ -62,13 +64,13 @@ def pdf_to_ppt(file_path, pages=None, slide_width=10.0, slide_height=7.5):
         prs.slide_width = Inches(slide_width)
         prs.slide_height = Inches(slide_height)
 
-        temp_images = []
+        # Slide images go in a private temp dir, removed in one call when we're done
+        temp_dir = tempfile.mkdtemp(prefix="temp_slides_", dir=upload_folder)
         
-        for img in images:
+        for i, img in enumerate(images):
             slide = prs.slides.add_slide(prs.slide_layouts[6])  # Blank slide
-            img_path = os.path.join(upload_folder, f"temp_slide_{time.time()}_{stored_name}.png")
+            img_path = os.path.join(temp_dir, f"slide_{i}.png")
             img.save(img_path, "PNG")
-            temp_images.append(img_path)
             
             left = top = 0
             slide.shapes.add_picture(img_path, left, top, width=prs.slide_width, height=prs.slide_height)
@@ -76,11 +78,6 @@ def pdf_to_ppt(file_path, pages=None, slide_width=10.0, slide_height=7.5):
         # Save PowerPoint
         prs.save(out_path)
 
-        # Cleanup temporary images
-        for img_path in temp_images:
-            if os.path.exists(img_path):
-                os.remove(img_path)
-
         logger.info(f"Converted {file_path} to PowerPoint: {out_path}")
         return {
             'status': 'success',
@@ -94,17 +91,11 @@ def pdf_to_ppt(file_path, pages=None, slide_width=10.0, slide_height=7.5):
 
     except Exception as e:
         logger.error(f"PDF to PPT conversion failed for {file_path}: {str(e)}")
-        
-        # Cleanup any temporary files on error
-        upload_folder = get_session_folder('uploads')
-        temp_files = [f for f in os.listdir(upload_folder) if f.startswith(f"temp_slide_") and stored_name in f]
-        for temp_file in temp_files:
-            temp_path = os.path.join(upload_folder, temp_file)
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-                
         return {
             'status': 'error',
             'output_files': [],
             'message': f"Conversion failed: {str(e)}"
         }
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
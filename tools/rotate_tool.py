@@ -1,7 +1,8 @@
 # tools/rotate_tool.py
 import os
+import shutil
 import logging
-from PyPDF2 import PdfReader, PdfWriter
+import fitz  # PyMuPDF
 from flask import current_app
 from utils.file_utils import validate_file_size
 from utils.file_manager import get_session_folder
@@ -38,28 +39,41 @@ def rotate_pdf(file_path, pages=None, rotation_angles=None):
         # Ensure directory exists
         os.makedirs(os.path.dirname(out_path), exist_ok=True)
 
-        reader = PdfReader(file_path)
-        writer = PdfWriter()
+        # Only each page's /Rotate entry changes; content streams are written back untouched
+        doc = fitz.open(file_path)
 
-        total_pages = len(reader.pages)
+        total_pages = len(doc)
 
         # If no pages specified, rotate all pages by 90 degrees default
         if not pages:
-            pages_to_rotate = list(range(total_pages))
+            pages_to_rotate = frozenset(range(total_pages))
         else:
-            pages_to_rotate = [p-1 for p in pages if 0 <= p-1 < total_pages]
+            pages_to_rotate = frozenset(p-1 for p in pages if 0 <= p-1 < total_pages)
 
-        for i in range(total_pages):
-            page = reader.pages[i]
-            if i in pages_to_rotate:
+        try:
+            # Effective rotation per page; multiples of 360 leave the page untouched
+            rotations = {}
+            for i in sorted(pages_to_rotate):
                 angle = 90  # default rotation
                 if rotation_angles and str(i) in rotation_angles:
-                    angle = rotation_angles[str(i)]
-                page.rotate(angle)
-            writer.add_page(page)
+                    angle = int(rotation_angles[str(i)])
+                if angle % 360:
+                    rotations[i] = angle % 360
 
-        with open(out_path, "wb") as f_out:
-            writer.write(f_out)
+            if rotations:
+                for i, angle in rotations.items():
+                    page = doc[i]
+                    page.set_rotation((page.rotation + angle) % 360)
+
+                # No garbage collection or cleaning: unchanged objects and streams are copied as-is
+                doc.save(out_path)
+        finally:
+            doc.close()
+
+        if not rotations:
+            # Nothing to change: the output is a byte copy of the input. Copied, not
+            # hard-linked, so it gets its own mtime for age-based cleanup of processed files
+            shutil.copyfile(file_path, out_path)
 
         logger.info(f"Rotated pages in {file_path} saved to {out_path}")
         return {
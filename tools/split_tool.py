@@ -1,62 +1,184 @@
 # tools/split_tool.py
 import os
 import json
-import zipfile
 import logging
 import tempfile
 import re
+import heapq
+import shutil
+from itertools import islice
+import subprocess
+from concurrent.futures.process import BrokenProcessPool
 from flask import current_app
-from PyPDF2 import PdfReader, PdfWriter
+import fitz  # PyMuPDF
 from utils.file_utils import validate_file_size
 from utils.file_manager import get_session_folder
-from utils.file_naming_utils import generate_file_names
+from utils.file_naming_utils import generate_file_names, generate_file_names_batch
+from utils.pdf_cache import get_cached_pdf
+from utils.worker_pool import get_worker_pool, discard_worker_pool
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-def parse_page_ranges(page_ranges_str, total_pages):
+# Below this many pages, starting worker processes costs more than writing serially
+SPLIT_PARALLEL_MIN_PAGES = 4
+SPLIT_MAX_WORKERS = 8
+
+# qpdf's CLI splits a whole document in one C++ pass; used for plain "split everything" requests
+QPDF_BINARY = shutil.which('qpdf')
+QPDF_TIMEOUT = 300  # Seconds
+
+def _get_max_workers(page_count):
+    """Worker processes for a split: bounded by CPUs, pages and SPLIT_MAX_WORKERS"""
+    return max(1, min(os.cpu_count() or 1, page_count, SPLIT_MAX_WORKERS))
+
+# ------------------- Split Workers -------------------
+# PyMuPDF holds the GIL while copying pages, so threads would not overlap; blocks of pages
+# are written on the shared worker process pool (utils.worker_pool) instead.
+
+def _page_runs(pages_0_based):
+    """Split a page sequence into (first, last) runs of consecutive pages, keeping order"""
+    runs = []
+    for page in pages_0_based:
+        if runs and page == runs[-1][1] + 1:
+            runs[-1][1] = page
+        else:
+            runs.append([page, page])
+    return runs
+
+def _copy_pages(src, jobs):
     """
-    Parse page range string like "1-3,5-7,9" into list of page numbers
+    Write each (pages_0_based, output_path) job as one PDF holding those pages and return
+    (output_path, size) tuples. Each run of consecutive pages is copied with one insert_pdf
+    call, so resources the run's pages share are copied once; outputs made of several runs
+    are saved with duplicate-stream merging so shared images aren't stored per run.
+    src is only read, never modified.
+    """
+    written = []
+    for pages_0_based, output_path in jobs:
+        runs = _page_runs(pages_0_based)
+        with fitz.open() as dst:
+            for first, last in runs:
+                dst.insert_pdf(src, from_page=first, to_page=last)
+            dst.save(output_path, garbage=4 if len(runs) > 1 else 0)
+        # save() raises on failure, so a single stat for the log is all the checking needed
+        written.append((output_path, os.stat(output_path).st_size))
+    return written
+
+def _sync_dir(folder):
+    """
+    fsync folder once after a batch of writes so the new directory entries are durable.
+    File contents are left to normal writeback; outputs are short-lived downloads.
+    """
+    if not hasattr(os, 'O_DIRECTORY'):
+        return  # Directories can't be opened for fsync on Windows
+    try:
+        fd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.debug(f"Directory sync skipped for {folder}: {e}")
+
+def _prefetch(file_path):
+    """
+    Ask the kernel to read file_path into the page cache ahead of the workers, so all of
+    them are served from the same cached pages instead of each faulting the file in.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return  # Not available on Windows/macOS
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.debug(f"Prefetch skipped for {file_path}: {e}")
+
+def _split_with_qpdf(file_path, pages_per_file, output_paths, work_folder):
+    """
+    Split every page of file_path with `qpdf --split-pages` and move the results to
+    output_paths (in page order). Returns False, leaving nothing behind, if qpdf fails or
+    produces an unexpected number of files, so the caller can fall back to PyMuPDF.
+    """
+    temp_dir = tempfile.mkdtemp(prefix="qpdf_split_", dir=work_folder)
+    try:
+        result = subprocess.run(
+            [QPDF_BINARY, f"--split-pages={pages_per_file}", file_path, os.path.join(temp_dir, "part-%d.pdf")],
+            capture_output=True, timeout=QPDF_TIMEOUT)
+        if result.returncode not in (0, 3):  # 3 = succeeded with warnings
+            logger.warning(f"qpdf split failed ({result.returncode}): {result.stderr.decode(errors='replace').strip()}")
+            return False
+        
+        # qpdf zero-pads the page numbers, so name order is page order
+        parts = sorted(os.listdir(temp_dir))
+        if len(parts) != len(output_paths):
+            logger.warning(f"qpdf produced {len(parts)} files, expected {len(output_paths)}")
+            return False
+        for part, output_path in zip(parts, output_paths):
+            os.replace(os.path.join(temp_dir, part), output_path)
+        return True
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"qpdf split failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def _write_pages(file_path, jobs):
+    """
+    Worker-process entry point for _copy_pages: opens the source once per block of jobs
+    and takes only plain arguments (no Flask context).
+    """
+    with fitz.open(file_path) as src:
+        return _copy_pages(src, jobs)
+
+# One comma-separated token per match: a page ("5") or range ("1-3") with optional spaces,
+# or anything else up to the next comma (skipped, like before). int() only ever sees \d+
+# groups, so malformed input is skipped by the match itself and never raises
+_RANGE_RE = re.compile(r'\s*(\d+)\s*(?:-\s*(\d+)\s*)?(?:,|$)|[^,]*(?:,|$)')
+
+def iter_page_ranges(page_ranges_str, total_pages):
+    """
+    Yield the page numbers selected by a range string like "1-3,5-7,9", ascending and
+    without duplicates. Overlapping ranges are merged as they are read, without building
+    a list per range first.
     """
-    pages = set()
-    
     if not page_ranges_str:
-        return list(range(1, total_pages + 1))
-    
-    # Split by commas
-    ranges = page_ranges_str.split(',')
+        yield from range(1, total_pages + 1)
+        return
     
-    for range_str in ranges:
-        range_str = range_str.strip()
-        if not range_str:
-            continue
-            
-        # Handle single page
-        if '-' not in range_str:
-            try:
-                page = int(range_str)
-                if 1 <= page <= total_pages:
-                    pages.add(page)
-            except ValueError:
-                continue
-        # Handle page range
+    ranges = []
+    for match in _RANGE_RE.finditer(page_ranges_str):
+        start, end = match.group(1), match.group(2)
+        if start is None:
+            continue  # Empty or malformed token
+        
+        start = int(start)
+        if end is None:
+            # Handle single page
+            if 1 <= start <= total_pages:
+                ranges.append(range(start, start + 1))
         else:
-            try:
-                start, end = range_str.split('-', 1)
-                start = int(start.strip())
-                end = int(end.strip())
-                
-                # Ensure valid range
-                if start < 1:
-                    start = 1
-                if end > total_pages:
-                    end = total_pages
-                if start <= end:
-                    pages.update(range(start, end + 1))
-            except ValueError:
-                continue
+            # Handle page range, clamped to the document
+            start = max(start, 1)
+            end = min(int(end), total_pages)
+            if start <= end:
+                ranges.append(range(start, end + 1))
     
-    return sorted(pages)
+    # Each range is already sorted; merge them and skip pages covered twice
+    last = 0
+    for page in heapq.merge(*ranges):
+        if page != last:
+            last = page
+            yield page
+
+def parse_page_ranges(page_ranges_str, total_pages):
+    """
+    Parse page range string like "1-3,5-7,9" into list of page numbers
+    """
+    return list(iter_page_ranges(page_ranges_str, total_pages))
 
 def split_pdf(file_path, pages=None, tool_options=None):
     """
@@ -70,6 +192,11 @@ def split_pdf(file_path, pages=None, tool_options=None):
         # Extract page_ranges and split_option from tool_options if provided
         page_ranges_str = tool_options.get('page_ranges', '') if tool_options else ''
         split_option = tool_options.get('split_option', 'all') if tool_options else 'all' # 'all' or 'single'
+        # Selected pages per output PDF (1 = one file per page)
+        try:
+            pages_per_file = max(1, int(tool_options.get('pages_per_file', 1))) if tool_options else 1
+        except (TypeError, ValueError):
+            pages_per_file = 1
         
         logger.info(f"Starting split_pdf for: {file_path}, pages: {pages}, page_ranges_str: {page_ranges_str}, split_option: {split_option}")
         
@@ -91,8 +218,9 @@ def split_pdf(file_path, pages=None, tool_options=None):
         # Ensure output directory exists
         os.makedirs(processed_folder, exist_ok=True)
 
-        pdf = PdfReader(file_path)
-        total_pages = len(pdf.pages)
+        # The parsed document is cached, so repeat splits of the same upload skip re-parsing
+        with get_cached_pdf(file_path) as pdf:
+            total_pages = pdf.page_count
         logger.info(f"PDF has {total_pages} pages")
         
         # Determine which pages to split based on priority:
@@ -100,14 +228,18 @@ def split_pdf(file_path, pages=None, tool_options=None):
         # 2. 'pages' list from page_selections
         # 3. All pages if neither is specified
         if page_ranges_str:
-            pages_to_split_1_based = parse_page_ranges(page_ranges_str, total_pages)
-            pages_to_split_0_based = [p-1 for p in pages_to_split_1_based]  # Convert to 0-based
+            pages_iter = (p-1 for p in iter_page_ranges(page_ranges_str, total_pages))  # Convert to 0-based
         elif pages:
-            pages_to_split_0_based = [p-1 for p in pages if 1 <= p <= total_pages]
+            pages_iter = (p-1 for p in pages if 1 <= p <= total_pages)
         else:
-            pages_to_split_0_based = list(range(total_pages))
+            pages_iter = iter(range(total_pages))
+        
+        # One tuple of pages per output file. All groups are built up front: output names
+        # and worker blocks need the full count
+        page_groups = list(iter(lambda: tuple(islice(pages_iter, pages_per_file)), ()))
+        selected_count = sum(map(len, page_groups))
         
-        if not pages_to_split_0_based:
+        if not selected_count:
             logger.warning("No valid pages selected for splitting")
             return {
                 'status': 'error',
@@ -115,45 +247,63 @@ def split_pdf(file_path, pages=None, tool_options=None):
                 'message': "No valid pages selected for splitting"
             }
         
-        logger.info(f"Pages to split (0-based): {pages_to_split_0_based}")
+        logger.info(f"Splitting {selected_count} page(s) into {len(page_groups)} file(s)")
         
-        output_files_paths = [] # This will store the paths of the generated files
+        output_files = [] # (output_path, display_name, stored_name) of each generated file
+        planned_paths = [] # Every path a write was started for, for cleanup on failure
 
         try:
-            if split_option == 'all' or len(pages_to_split_0_based) > 1:
+            if split_option == 'all' or selected_count > 1:
                 # If 'all' option is selected or multiple pages are to be split,
                 # create individual PDFs and return their paths.
                 # The generic_tools.py will then decide whether to zip them or not.
                 
-                for page_num_0_based in pages_to_split_0_based:
-                    writer = PdfWriter()
-                    writer.add_page(pdf.pages[page_num_0_based])
-                    
-                    # Generate secure name for individual page
-                    # Use original filename as base for display name
-                    base_original_name = os.path.splitext(original_filename)[0]
-                    page_display_name = f"{base_original_name}_page_{page_num_0_based+1}.pdf"
-                    
-                    file_names = generate_file_names(page_display_name, toolname='split', ext='pdf')
-                    stored_name = file_names['stored_name']
-                    output_path = os.path.join(processed_folder, stored_name)
-                    
-                    logger.info(f"Creating page {page_num_0_based+1}: {output_path}")
-                    with open(output_path, "wb") as f:
-                        writer.write(f)
-                    
-                    # Verify page was created
-                    if os.path.exists(output_path):
-                        logger.info(f"Page created successfully: {output_path} ({os.path.getsize(output_path)} bytes)")
-                        output_files_paths.append(output_path)
-                    else:
-                        logger.error(f"Failed to create page: {output_path}")
+                # Names are generated here, in the request context; workers only get plain paths
+                base_original_name = os.path.splitext(original_filename)[0]
+                # Use original filename as base for display names
+                page_display_names = [
+                    f"{base_original_name}_page_{group[0]+1}.pdf" if len(group) == 1
+                    else f"{base_original_name}_pages_{group[0]+1}-{group[-1]+1}.pdf"
+                    for group in page_groups
+                ]
+                # One secure prefix for the whole split, plus a per-file index
+                batch_names = generate_file_names_batch(page_display_names, toolname='split', ext='pdf')
+                planned_paths = [os.path.join(processed_folder, names['stored_name']) for names in batch_names]
+                
+                jobs = list(zip(page_groups, planned_paths))
+                # Fast path: every page, no filtering, qpdf installed
+                use_qpdf = QPDF_BINARY and not page_ranges_str and not pages and split_option == 'all'
+                if use_qpdf and _split_with_qpdf(file_path, pages_per_file, planned_paths, processed_folder):
+                    logger.info(f"Split {total_pages} pages with qpdf")
+                    written = [(path, os.stat(path).st_size) for path in planned_paths]
+                elif len(jobs) >= SPLIT_PARALLEL_MIN_PAGES:
+                    # One contiguous block of jobs per worker, so each worker parses the source once
+                    workers = _get_max_workers(len(jobs))
+                    block = -(-len(jobs) // workers)
+                    blocks = [jobs[i:i + block] for i in range(0, len(jobs), block)]
+                    logger.info(f"Writing {len(jobs)} files with {workers} worker processes")
+                    _prefetch(file_path)
+                    pool = get_worker_pool()
+                    try:
+                        written = [path for paths in pool.map(_write_pages, [file_path] * len(blocks), blocks)
+                                   for path in paths]
+                    except BrokenProcessPool:
+                        logger.warning("Split worker pool broke; writing pages in-process")
+                        discard_worker_pool(pool)
+                        with get_cached_pdf(file_path) as src:
+                            written = _copy_pages(src, jobs)
+                else:
+                    with get_cached_pdf(file_path) as src:
+                        written = _copy_pages(src, jobs)
+                
+                # written is in job order, so it lines up with batch_names
+                for (output_path, size), names in zip(written, batch_names):
+                    logger.info(f"Page created successfully: {output_path} ({size} bytes)")
+                    output_files.append((output_path, names['display_name'], names['stored_name']))
                 
-            elif split_option == 'single' and len(pages_to_split_0_based) == 1:
+            elif split_option == 'single' and selected_count == 1:
                 # Single page output
-                page_num_0_based = pages_to_split_0_based[0]
-                writer = PdfWriter()
-                writer.add_page(pdf.pages[page_num_0_based])
+                page_num_0_based = page_groups[0][0]
                 
                 # Generate secure file name for single page
                 base_original_name = os.path.splitext(original_filename)[0]
@@ -162,17 +312,20 @@ def split_pdf(file_path, pages=None, tool_options=None):
                 file_names = generate_file_names(single_page_display_name, toolname='split', ext='pdf')
                 stored_name = file_names['stored_name']
                 output_path = os.path.join(processed_folder, stored_name)
+                planned_paths = [output_path]
                 logger.info(f"Creating single page: {output_path}")
                 
-                with open(output_path, "wb") as f:
-                    writer.write(f)
-                
-                # Verify file was created
-                if os.path.exists(output_path):
-                    logger.info(f"Single page created: {output_path} ({os.path.getsize(output_path)} bytes)")
-                    output_files_paths.append(output_path)
+                if total_pages == 1:
+                    # The only page of the document: the output is the input, no rewrite needed.
+                    # Copied, not hard-linked, so the output gets its own mtime for cleanup
+                    shutil.copyfile(file_path, output_path)
+                    size = os.stat(output_path).st_size
                 else:
-                    logger.error(f"Failed to create single page: {output_path}")
+                    with get_cached_pdf(file_path) as src:
+                        (output_path, size), = _copy_pages(src, [((page_num_0_based,), output_path)])
+                
+                logger.info(f"Single page created: {output_path} ({size} bytes)")
+                output_files.append((output_path, file_names['display_name'], stored_name))
             else:
                 logger.warning(f"Split option '{split_option}' not supported for current page selection or number of pages.")
                 return {
@@ -181,35 +334,24 @@ def split_pdf(file_path, pages=None, tool_options=None):
                     'message': f"Split option '{split_option}' not supported for current page selection or number of pages."
                 }
 
-            logger.info(f"Successfully created {len(output_files_paths)} output file(s)")
-            
-            # Verify files actually exist
-            for output_file in output_files_paths:
-                if not os.path.exists(output_file):
-                    logger.error(f"Output file does not exist: {output_file}")
-                    return {
-                        'status': 'error',
-                        'output_files': [],
-                        'message': f"Failed to create output file: {os.path.basename(output_file)}"
-                    }
-                else:
-                    logger.info(f"Output file verified: {output_file} ({os.path.getsize(output_file)} bytes)")
+            _sync_dir(processed_folder)
+            logger.info(f"Successfully created {len(output_files)} output file(s)")
             
             # Return the list of individual file paths. generic_tools.py will handle zipping if needed.
             return {
                 'status': 'success', 
                 'output_files': [{
-                    'display_name': os.path.basename(path), # Use the generated display name
-                    'stored_name': os.path.basename(path),
+                    'display_name': display_name, # e.g. report_page_3.pdf or report_pages_1-4.pdf
+                    'stored_name': stored_name,
                     'output_path': path
-                } for path in output_files_paths],
-                'message': f"Successfully split {len(pages_to_split_0_based)} page(s)"
+                } for path, display_name, stored_name in output_files],
+                'message': f"Successfully split {selected_count} page(s)"
             }
 
         except Exception as e:
             logger.error(f"Error during PDF splitting: {str(e)}", exc_info=True)
             # Cleanup any partially created files
-            for output_file in output_files_paths:
+            for output_file in planned_paths:
                 if os.path.exists(output_file):
                     try:
                         os.remove(output_file)
@@ -3,15 +3,14 @@ import os
 import shutil
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from .file_manager import get_thumbnail_cache_folder
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-# Initialize scheduler (will be configured in main app)
-scheduler = BackgroundScheduler()
-
 def get_session_folder_path(base_folder: str, session_id: str) -> str:
     """
     Get the session folder path based on session ID.
@@ -19,6 +18,10 @@ def get_session_folder_path(base_folder: str, session_id: str) -> str:
     """
     return os.path.join(base_folder, f"sess_{session_id}")
 
+def _log_rmtree_error(func, path, exc_info) -> None:
+    """shutil.rmtree error handler: log the failing path and keep deleting the rest."""
+    logger.warning(f"Could not remove {path} during cleanup: {exc_info[1]}")
+
 def manual_clear_session_folders(session_id: str) -> None:
     """
     Immediately deletes the session's uploads/sess_<id>/, processed/sess_<id>/, 
@@ -41,59 +44,107 @@ def manual_clear_session_folders(session_id: str) -> None:
                 # Count files before deletion
                 file_count = sum(len(files) for _, _, files in os.walk(session_folder))
                 
-                # Remove the entire session folder
-                shutil.rmtree(session_folder)
+                # Remove the entire session folder, logging (not aborting on) individual failures
+                shutil.rmtree(session_folder, onerror=_log_rmtree_error)
                 logger.info(f"Manually cleaned up session folder: {session_folder} ({file_count} files)")
                 
             except Exception as e:
                 logger.error(f"Failed to clean up session folder {session_folder}: {e}")
 
-def _scheduled_cleanup_job(session_id: str) -> None:
+SESSION_SWEEP_JOB_ID = "session_sweep"
+
+def _scheduled_sweep_job(app, max_age_minutes: int) -> None:
+    """
+    Internal function to perform the periodic session sweep.
+    Runs inside the given app's context since the scheduler thread has none.
+    """
+    with app.app_context():
+        cleanup_old_sessions(max_age_minutes=max_age_minutes)
+        prune_thumbnail_cache()
+
+def register_session_sweep(scheduler, app, max_age_minutes: int = 10) -> None:
     """
-    Internal function to perform the actual cleanup.
-    Called by the scheduler after the delay.
+    Add the single periodic session sweep to the app's scheduler. Call once at startup:
+    every minute it removes sess_* folders older than max_age_minutes and prunes the
+    thumbnail cache, so no per-session jobs are needed.
     """
-    logger.info(f"Performing scheduled cleanup for session: {session_id}")
-    manual_clear_session_folders(session_id)
+    scheduler.add_job(
+        _scheduled_sweep_job,
+        IntervalTrigger(minutes=1),
+        args=[app, max_age_minutes],
+        id=SESSION_SWEEP_JOB_ID,
+        name='Periodic session folder sweep',
+        replace_existing=True
+    )
+    logger.info(f"Scheduled periodic session sweep (max age {max_age_minutes} minutes)")
 
 def schedule_session_cleanup(session_id: str, delay_seconds: int = 600) -> None:
     """
-    Uses APScheduler BackgroundScheduler to schedule deletion of that session's
-    folders after the specified delay.
-    
-    Args:
-        session_id (str): The session ID to schedule cleanup for
-        delay_seconds (int): Delay in seconds before cleanup (default: 600 = 10 minutes)
+    Kept for compatibility: session folders are removed by the periodic sweep
+    registered with register_session_sweep, so nothing is scheduled per session.
+    """
+    logger.debug(f"Session {session_id} covered by periodic session sweep")
+
+def _sweep_session_folders(base_folder: str, now: float, max_age_seconds: float) -> tuple:
+    """
+    Delete expired sess_* folders inside a single base folder.
+    Returns (folders_checked, folders_deleted) for that base folder.
     """
+    folders_checked = 0
+    folders_deleted = 0
+    
+    if not os.path.exists(base_folder):
+        return folders_checked, folders_deleted
+        
     try:
-        # Ensure scheduler is running
-        if not scheduler.running:
-            scheduler.start()
-            
-        scheduler.add_job(
-            _scheduled_cleanup_job,
-            'date',
-            run_date=time.time() + delay_seconds,
-            args=[session_id],
-            id=f"cleanup_{session_id}",
-            replace_existing=True
-        )
-        logger.info(f"Scheduled cleanup for session {session_id} in {delay_seconds} seconds")
+        # One scandir pass per base folder; each entry is stat'ed once
+        with os.scandir(base_folder) as entries:
+            session_entries = [e for e in entries if e.name.startswith('sess_') and e.is_dir()]
+
+        for entry in session_entries:
+            session_folder = entry.path
+            folders_checked += 1
+
+            # Check folder age using creation time or modification time
+            # Use the oldest time between creation and modification
+            try:
+                st = entry.stat()
+                folder_age = now - min(st.st_mtime, st.st_ctime)
+            except OSError:
+                # If we can't get times, skip this folder
+                continue
+
+            if folder_age > max_age_seconds:
+                try:
+                    # Count files before deletion
+                    file_count = sum(len(files) for _, _, files in os.walk(session_folder))
+
+                    # Remove the entire session folder, logging (not aborting on) individual failures
+                    shutil.rmtree(session_folder, onerror=_log_rmtree_error)
+                    folders_deleted += 1
+                    logger.info(f"Cleaned up old session folder: {session_folder} (age: {folder_age/60:.1f} minutes, {file_count} files)")
+
+                except Exception as e:
+                    logger.error(f"Failed to clean up old session folder {session_folder}: {e}")
+
     except Exception as e:
-        logger.error(f"Failed to schedule cleanup for session {session_id}: {e}")
+        logger.error(f"Error checking for old sessions in {base_folder}: {e}")
+    
+    return folders_checked, folders_deleted
 
 def cleanup_old_sessions(max_age_minutes: int = 10) -> None:
     """
     Iterate over all sess_* folders in uploads/, processed/, and previews/.
     Delete folders older than max_age_minutes.
     
+    The three base folders are independent directory trees, so they are
+    swept concurrently; the work is dominated by stat/unlink syscalls.
+    
     Args:
         max_age_minutes (int): Maximum age in minutes before folders are deleted (default: 10)
     """
     max_age_seconds = max_age_minutes * 60
     now = time.time()
-    folders_checked = 0
-    folders_deleted = 0
     
     folders_to_check = [
         current_app.config.get('UPLOAD_FOLDER', 'uploads'),
@@ -101,46 +152,63 @@ def cleanup_old_sessions(max_age_minutes: int = 10) -> None:
         current_app.config.get('PREVIEWS_FOLDER', 'previews')
     ]
     
-    for base_folder in folders_to_check:
-        if not os.path.exists(base_folder):
-            continue
-            
-        try:
-            for item in os.listdir(base_folder):
-                if item.startswith('sess_'):
-                    session_folder = os.path.join(base_folder, item)
-                    
-                    if os.path.isdir(session_folder):
-                        folders_checked += 1
-                        
-                        # Check folder age using creation time or modification time
-                        # Use the oldest time between creation and modification
-                        try:
-                            folder_mtime = os.path.getmtime(session_folder)
-                            folder_ctime = os.path.getctime(session_folder)
-                            folder_age = now - min(folder_mtime, folder_ctime)
-                        except OSError:
-                            # If we can't get times, skip this folder
-                            continue
-                        
-                        if folder_age > max_age_seconds:
-                            try:
-                                # Count files before deletion
-                                file_count = sum(len(files) for _, _, files in os.walk(session_folder))
-                                
-                                # Remove the entire session folder
-                                shutil.rmtree(session_folder)
-                                folders_deleted += 1
-                                logger.info(f"Cleaned up old session folder: {session_folder} (age: {folder_age/60:.1f} minutes, {file_count} files)")
-                                
-                            except Exception as e:
-                                logger.error(f"Failed to clean up old session folder {session_folder}: {e}")
-                                
-        except Exception as e:
-            logger.error(f"Error checking for old sessions in {base_folder}: {e}")
+    with ThreadPoolExecutor(max_workers=len(folders_to_check)) as executor:
+        results = list(executor.map(
+            lambda base_folder: _sweep_session_folders(base_folder, now, max_age_seconds),
+            folders_to_check
+        ))
+    
+    folders_checked = sum(checked for checked, _ in results)
+    folders_deleted = sum(deleted for _, deleted in results)
     
     logger.info(f"Global cleanup completed: checked {folders_checked} session folders, deleted {folders_deleted} old folders")
 
+def prune_thumbnail_cache(max_size_mb=None):
+    """
+    Keep the shared thumbnail cache under max_size_mb by deleting the least
+    recently used thumbnails first (cache hits refresh a thumbnail's mtime).
+    Returns the number of files deleted.
+    """
+    if max_size_mb is None:
+        max_size_mb = current_app.config.get('THUMBNAIL_CACHE_MAX_MB', 200)
+    cache_folder = get_thumbnail_cache_folder()
+    max_size_bytes = max_size_mb * 1024 * 1024
+    
+    entries = []
+    total_size = 0
+    try:
+        with os.scandir(cache_folder) as it:
+            for entry in it:
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total_size += st.st_size
+    except OSError as e:
+        logger.error(f"Error scanning thumbnail cache {cache_folder}: {e}")
+        return 0
+    
+    if total_size <= max_size_bytes:
+        return 0
+    
+    files_deleted = 0
+    entries.sort()
+    for _, size, path in entries:
+        if total_size <= max_size_bytes:
+            break
+        try:
+            os.unlink(path)
+            total_size -= size
+            files_deleted += 1
+        except OSError as e:
+            logger.error(f"Failed to delete cached thumbnail {path}: {e}")
+    
+    logger.info(f"Pruned {files_deleted} thumbnails from cache ({total_size / (1024 * 1024):.1f} MB left)")
+    return files_deleted
+
 def cleanup_folder(folder_path, max_age_minutes=10, extensions=None):
     """
     Remove files older than max_age_minutes from a folder.
@@ -158,31 +226,38 @@ def cleanup_folder(folder_path, max_age_minutes=10, extensions=None):
     max_age_seconds = max_age_minutes * 60
     files_deleted = 0
     
+    # Normalize extensions once instead of per file
+    suffixes = tuple(ext.lower() for ext in extensions) if extensions else None
+    
     try:
-        for filename in os.listdir(folder_path):
-            file_path = os.path.join(folder_path, filename)
-            
-            # Skip directories and check file extension
-            if not os.path.isfile(file_path):
-                continue
+        # Single scandir pass: collect (path, name, age) for expired files
+        expired = []
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                # Skip directories and check file extension
+                if not entry.is_file():
+                    continue
+                    
+                if suffixes and not entry.name.lower().endswith(suffixes):
+                    continue
                 
-            if extensions and not any(filename.lower().endswith(ext.lower()) for ext in extensions):
-                continue
-            
-            try:
-                file_age = now - os.path.getmtime(file_path)
-            except OSError:
-                # Skip files we can't get mtime for
-                continue
-            
-            if file_age > max_age_seconds:
                 try:
-                    os.remove(file_path)
-                    files_deleted += 1
-                    logger.debug(f"Cleaned up file: {filename} (age: {file_age/60:.1f} minutes)")
-                except Exception as e:
-                    logger.error(f"Failed to delete {filename}: {e}")
-                    
+                    file_age = now - entry.stat().st_mtime
+                except OSError:
+                    # Skip files we can't get mtime for
+                    continue
+                
+                if file_age > max_age_seconds:
+                    expired.append((entry.path, entry.name, file_age))
+        
+        for file_path, filename, file_age in expired:
+            try:
+                os.unlink(file_path)
+                files_deleted += 1
+                logger.debug(f"Cleaned up file: {filename} (age: {file_age/60:.1f} minutes)")
+            except Exception as e:
+                logger.error(f"Failed to delete {filename}: {e}")
+                
         if files_deleted > 0:
             logger.info(f"Cleaned up {files_deleted} files from {folder_path}")
         return files_deleted
@@ -253,6 +328,9 @@ def cleanup_aged_files(upload_max_age_minutes=10, preview_max_age_minutes=10, pr
     # Also clean up old session folders
     cleanup_old_sessions(max(processed_max_age_minutes, 10))
     
+    # Keep the shared thumbnail cache bounded
+    total_deleted += prune_thumbnail_cache()
+    
     return total_deleted
 
 def get_folder_size(folder_path):
@@ -271,6 +349,43 @@ def get_folder_size(folder_path):
         logger.error(f"Error getting folder size for {folder_path}: {e}")
         return 0
 
+def _scan_folder_usage(folder_path, max_age_minutes):
+    """
+    Single pass over folder_path that both totals the size of the whole tree
+    (like get_folder_size) and collects the top-level files older than
+    max_age_minutes (the ones cleanup_folder would delete).
+    Returns (size_mb, [(file_path, filename, file_age), ...]).
+    """
+    now = time.time()
+    max_age_seconds = max_age_minutes * 60
+    total_size = 0
+    expired = []
+    pending = [(folder_path, True)]
+    
+    while pending:
+        current, is_top_level = pending.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append((entry.path, False))
+                            continue
+                        if not entry.is_file():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue  # Skip files we can't access
+                    
+                    total_size += st.st_size
+                    file_age = now - st.st_mtime
+                    if is_top_level and file_age > max_age_seconds:
+                        expired.append((entry.path, entry.name, file_age))
+        except OSError as e:
+            logger.error(f"Error scanning folder {current}: {e}")
+    
+    return total_size / (1024 * 1024), expired
+
 def cleanup_if_needed(max_size_mb=1000):
     """
     Emergency cleanup if folders get too large
@@ -287,11 +402,21 @@ def cleanup_if_needed(max_size_mb=1000):
     
     for folder in folders_to_check:
         if os.path.exists(folder):
-            size_mb = get_folder_size(folder)
+            # Clean files older than 1 minute in emergency; sizing and candidate
+            # collection share one directory pass
+            size_mb, expired = _scan_folder_usage(folder, max_age_minutes=1)
             if size_mb > max_size_mb:
                 logger.warning(f"Folder {folder} exceeds size limit ({size_mb:.1f} MB > {max_size_mb} MB), performing emergency cleanup")
-                # Clean files older than 1 minute in emergency
-                cleanup_folder(folder, max_age_minutes=1)
+                files_deleted = 0
+                for file_path, filename, file_age in expired:
+                    try:
+                        os.unlink(file_path)
+                        files_deleted += 1
+                        logger.debug(f"Cleaned up file: {filename} (age: {file_age/60:.1f} minutes)")
+                    except Exception as e:
+                        logger.error(f"Failed to delete {filename}: {e}")
+                if files_deleted > 0:
+                    logger.info(f"Cleaned up {files_deleted} files from {folder}")
 
 # Flask CLI command for manual cleanup
 def init_cleanup_cli(app):
@@ -334,11 +459,3 @@ def init_cleanup_cli(app):
         with app.app_context():
             cleanup_if_needed()
             print("Emergency cleanup completed")
-
-# Start the scheduler when this module is imported
-try:
-    if not scheduler.running:
-        scheduler.start()
-        logger.info("Cleanup scheduler started")
-except Exception as e:
-    logger.error(f"Failed to start cleanup scheduler: {e}")
@@ -1,12 +1,41 @@
 # utils/file_manager.py
 import os
 import uuid
+import shutil
 import logging
+import threading
+from typing import List, Set, Tuple
 from flask import session, current_app
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
+# Long-lived folders this process has already created; lets hot paths skip repeated makedirs
+# syscalls. Session folders are not memoized: any worker process may delete them.
+_ensured_dirs: Set[str] = set()
+_ensured_dirs_lock = threading.Lock()
+
+def ensure_dir(path: str) -> str:
+    """
+    os.makedirs(path, exist_ok=True), memoized per process.
+    Only for folders nothing deletes while the app runs (e.g. the thumbnail cache).
+    """
+    if path not in _ensured_dirs:
+        os.makedirs(path, exist_ok=True)
+        with _ensured_dirs_lock:
+            _ensured_dirs.add(path)
+        logger.debug(f"Folder ensured: {path}")
+    return path
+
+def link_or_copy(src: str, dst: str) -> None:
+    """Hard-link src to dst, falling back to a copy across filesystems"""
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        raise
+    except OSError:
+        shutil.copyfile(src, dst)
+
 def ensure_session_id() -> str:
     """
     Get or create a session ID for the current user.
@@ -33,13 +62,42 @@ def get_session_folder(base_folder: str) -> str:
     session_folder = os.path.join(base_folder, f"sess_{session_id}")
     
     try:
+        # Not memoized: the session sweep or another worker may have removed it since the last call
         os.makedirs(session_folder, exist_ok=True)
-        logger.debug(f"Session folder ensured: {session_folder}")
         return os.path.abspath(session_folder)
     except Exception as e:
         logger.error(f"Failed to create session folder {session_folder}: {e}")
         raise RuntimeError(f"Could not create session folder: {e}")
 
+def scan_session_folder(folder: str) -> List[Tuple[str, int, float]]:
+    """
+    List the regular files in a session folder as (name, size, mtime) tuples.
+    One scandir pass; each entry is stat'ed at most once. Returns [] if the
+    folder does not exist.
+    """
+    files = []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue  # Removed or unreadable since the listing
+                files.append((entry.name, st.st_size, st.st_mtime))
+    except FileNotFoundError:
+        pass
+    return files
+
+def get_thumbnail_cache_folder() -> str:
+    """
+    Get the shared (not session-specific) thumbnail cache folder inside CACHE_FOLDER.
+    Thumbnails there are keyed by file content, so they are reused across sessions.
+    """
+    cache_folder = ensure_dir(os.path.join(current_app.config.get('CACHE_FOLDER', 'cache'), 'thumbnails'))
+    return os.path.abspath(cache_folder)
+
 def get_session_upload_folder() -> str:
     """Get session-specific upload folder path"""
     return get_session_folder(current_app.config.get('UPLOAD_FOLDER', 'uploads'))
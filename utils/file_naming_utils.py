@@ -51,6 +51,37 @@ def generate_file_names(original_filename: str, toolname: str | None = None, ext
     logger.debug(f"Generated file names: {result}")
     return result
 
+def generate_file_names_batch(original_filenames: List[str], toolname: str | None = None, ext: str | None = None) -> List[dict]:
+    """
+    Generate file names for many outputs of one operation (e.g. one per page).
+    
+    All names share a single UUID/timestamp and get a 1-based index suffix,
+    so a batch costs one random draw instead of one per file.
+    
+    Args:
+        original_filenames (List[str]): Original filenames, in output order
+        toolname (str | None, optional): Name of the tool if processing a file. Defaults to None.
+        ext (str | None, optional): File extension override. Defaults to None.
+        
+    Returns:
+        List[dict]: One dictionary with display_name and stored_name per input
+    """
+    if ext is not None:
+        ext = (f".{ext}" if not ext.startswith('.') else ext).lower()
+    
+    unique_id = uuid.uuid4().hex[:8]
+    timestamp = str(int(time.time()))
+    prefix = f"{toolname}_{unique_id}_{timestamp}" if toolname else f"{unique_id}_{timestamp}"
+    
+    results = []
+    for index, original_filename in enumerate(original_filenames, start=1):
+        file_ext = ext if ext is not None else os.path.splitext(original_filename)[1].lower()
+        results.append({
+            "display_name": original_filename,
+            "stored_name": f"{prefix}_{index}{file_ext}"
+        })
+    return results
+
 # For backward compatibility with existing code
 def rename_processed_files(session_folder: str, session_files: Optional[List[Dict]] = None) -> int:
     """
@@ -4,20 +4,23 @@ import uuid
 import logging
 from werkzeug.utils import secure_filename
 from flask import current_app, session
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 from .file_manager import get_session_folder
 from .file_naming_utils import generate_file_names
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
+_DEFAULT_ALLOWED_EXTENSIONS = frozenset({'pdf'})
+
 def allowed_file(filename):
     """
     Check if the uploaded file has an allowed extension.
     Uses ALLOWED_EXTENSIONS from app config.
     """
-    allowed_extensions = getattr(current_app.config, "ALLOWED_EXTENSIONS", {'pdf'})
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
+    allowed_extensions = current_app.config.get("ALLOWED_EXTENSIONS", _DEFAULT_ALLOWED_EXTENSIONS)
+    _, dot, ext = filename.rpartition('.')
+    return bool(dot) and ext.lower() in allowed_extensions
 
 def validate_file(file):
     """
@@ -131,25 +134,42 @@ def is_file_locked(file_path):
     except IOError:
         return True
 
-def validate_file_size(file_path: str, max_size: int = 50 * 1024 * 1024) -> bool:
-    """Validate that file size is within limits"""
+def get_file_sizes(file_paths: List[str]) -> Dict[str, int]:
+    """
+    Stat every file once and return {path: size in bytes}.
+    Missing or unreadable files are left out of the result.
+    """
+    sizes = {}
+    for file_path in file_paths:
+        try:
+            sizes[file_path] = os.stat(file_path).st_size
+        except OSError:
+            continue
+    return sizes
+
+def validate_file_size(file_path: str, max_size: int = 50 * 1024 * 1024, size: Optional[int] = None) -> bool:
+    """Validate that file size is within limits; pass size to reuse an earlier stat"""
     try:
-        return os.path.getsize(file_path) <= max_size
+        if size is None:
+            size = os.path.getsize(file_path)
+        return size <= max_size
     except OSError:
         return False
 
-def validate_total_file_size(file_paths: List[str], max_total_size_mb: int = 10) -> Tuple[bool, str]:
-    """Validate that total size of all files is within limits"""
+def validate_total_file_size(file_paths: List[str], max_total_size_mb: int = 10,
+                             sizes: Optional[Dict[str, int]] = None) -> Tuple[bool, str]:
+    """Validate that total size of all files is within limits; pass sizes to reuse get_file_sizes()"""
     try:
         max_total_size_bytes = max_total_size_mb * 1024 * 1024
+        if sizes is None:
+            sizes = get_file_sizes(file_paths)
         total_size = 0
         
         for file_path in file_paths:
-            if not os.path.exists(file_path):
+            if file_path not in sizes:
                 return False, f"File not found: {os.path.basename(file_path)}"
             
-            file_size = os.path.getsize(file_path)
-            total_size += file_size
+            total_size += sizes[file_path]
             
             if total_size > max_total_size_bytes:
                 return False, f"Total file size exceeds {max_total_size_mb}MB limit"
@@ -0,0 +1,101 @@
+# utils/pdf_cache.py
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, List, Tuple
+import fitz  # PyMuPDF
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+DOC_CACHE_MAXSIZE = 32  # Parsed documents kept open per process
+DOC_CACHE_TTL = 300  # Seconds a cached document may sit unused before it is closed
+
+@dataclass(slots=True)
+class _DocEntry:
+    """A cached document; refs and evicted are only read or changed under _DOC_CACHE_LOCK"""
+    doc: Any
+    expires: float
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    refs: int = 0  # Callers currently holding the document
+    evicted: bool = False  # Removed from the cache; closed when the last caller releases it
+
+# Process-local LRU of parsed fitz.Documents keyed by (realpath, mtime, size), so repeated
+# previews, renders and splits of the same upload skip re-parsing. Uploads live in
+# per-session folders, so the resolved path already keeps sessions apart. Entries expire
+# once unused for DOC_CACHE_TTL. MuPDF documents are not thread-safe, so each entry
+# carries its own lock that is held while the document is in use; an evicted entry is
+# only closed once no caller holds it.
+_DOC_CACHE: "OrderedDict[Tuple[str, int, int], _DocEntry]" = OrderedDict()
+_DOC_CACHE_LOCK = threading.Lock()
+
+def _evict(entry: _DocEntry, to_close: List[_DocEntry]) -> None:
+    """Mark a removed entry evicted; queue it for closing if nobody holds it (cache lock held)"""
+    entry.evicted = True
+    if entry.refs == 0:
+        to_close.append(entry)
+
+def _close_doc(entry: _DocEntry) -> None:
+    """Close an evicted document that no caller can reach any more"""
+    try:
+        entry.doc.close()
+    except Exception:
+        pass
+
+@contextmanager
+def get_cached_pdf(path: str):
+    """
+    Yield a cached, shared fitz.Document for path (opened on first use).
+    The document is read-only for callers: modifying it would leak into other requests.
+    """
+    st = os.stat(path)
+    key = (os.path.realpath(path), st.st_mtime_ns, st.st_size)
+    now = time.monotonic()
+    to_close = []
+    
+    with _DOC_CACHE_LOCK:
+        # Drop expired entries, then reuse or open the requested document
+        for cache_key in [k for k, e in _DOC_CACHE.items() if e.expires <= now]:
+            _evict(_DOC_CACHE.pop(cache_key), to_close)
+        
+        entry = _DOC_CACHE.get(key)
+        if entry is None:
+            entry = _DocEntry(fitz.open(path), now + DOC_CACHE_TTL)
+            _DOC_CACHE[key] = entry
+            while len(_DOC_CACHE) > DOC_CACHE_MAXSIZE:
+                _evict(_DOC_CACHE.popitem(last=False)[1], to_close)
+        else:
+            _DOC_CACHE.move_to_end(key)
+            entry.expires = now + DOC_CACHE_TTL  # Hot documents stay open
+        # Taken under the cache lock, so an eviction can't close the document under us
+        entry.refs += 1
+    
+    # Close unreferenced evicted documents outside the cache lock
+    for old_entry in to_close:
+        _close_doc(old_entry)
+    
+    try:
+        with entry.lock:
+            yield entry.doc
+    finally:
+        with _DOC_CACHE_LOCK:
+            entry.refs -= 1
+            close_now = entry.evicted and entry.refs == 0
+        if close_now:
+            _close_doc(entry)
+
+@atexit.register
+def _close_cached_docs() -> None:
+    """Close every cached document at interpreter shutdown"""
+    to_close = []
+    with _DOC_CACHE_LOCK:
+        for entry in _DOC_CACHE.values():
+            _evict(entry, to_close)
+        _DOC_CACHE.clear()
+    for entry in to_close:
+        _close_doc(entry)
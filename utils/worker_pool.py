@@ -0,0 +1,52 @@
+# utils/worker_pool.py
+import os
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# One pool serves rendering, OCR and splitting, so a process never keeps more than this
+# many idle workers however many tools it has used
+WORKER_POOL_SIZE = os.cpu_count() or 1
+
+# The app is multithreaded (Flask, APScheduler), so forked workers could inherit locks held
+# by other threads (logging, MuPDF's store, the document cache) and deadlock. Workers are
+# started from a clean forkserver instead, or spawned where forkserver is unavailable.
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    _POOL_CONTEXT = multiprocessing.get_context('forkserver')
+    _POOL_CONTEXT.set_forkserver_preload(['fitz'])  # Workers start with PyMuPDF imported
+else:
+    _POOL_CONTEXT = multiprocessing.get_context('spawn')
+
+_WORKER_POOL: Optional[ProcessPoolExecutor] = None
+_WORKER_POOL_LOCK = threading.Lock()
+
+def get_worker_pool() -> ProcessPoolExecutor:
+    """Return the shared worker process pool, creating it on first use"""
+    global _WORKER_POOL
+    with _WORKER_POOL_LOCK:
+        if _WORKER_POOL is None:
+            _WORKER_POOL = ProcessPoolExecutor(max_workers=WORKER_POOL_SIZE, mp_context=_POOL_CONTEXT)
+            logger.info(f"Started worker pool with {WORKER_POOL_SIZE} processes ({_POOL_CONTEXT.get_start_method()})")
+        return _WORKER_POOL
+
+def discard_worker_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next call starts a fresh one"""
+    global _WORKER_POOL
+    with _WORKER_POOL_LOCK:
+        if _WORKER_POOL is pool:
+            _WORKER_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+@atexit.register
+def _shutdown_worker_pool() -> None:
+    """Stop the workers at interpreter shutdown"""
+    with _WORKER_POOL_LOCK:
+        pool = _WORKER_POOL
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)